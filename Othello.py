@@ -8,6 +8,17 @@
 #           valid moves are available. The score will then be shown and the winner declared...
 #           unless it's a tie.
 
+import bitboard
+from endgame import EndgameSolver
+from instrument import TIMED_METHODS, Instrumentation
+from search import SearchEngine
+
+# (row step, column step) for each direction a line of pieces can run in
+DIRECTION_STEPS = {
+    'north': (-1, 0), 'south': (1, 0), 'east': (0, 1), 'west': (0, -1),
+    'northeast': (-1, 1), 'northwest': (-1, -1), 'southeast': (1, 1), 'southwest': (1, -1)
+}
+
 
 class Player:
     """
@@ -45,6 +56,34 @@ class Player:
         self._pieces += number
 
 
+class MoveDelta:
+    """
+    This class records what a single move changed, so that the move can be taken back with
+    Othello.unmake_move(). It is created by Othello.apply_move().
+    Each MoveDelta holds the color and position of the placed piece, a bitboard of the
+    pieces that were taken, and the move-tracking state from before the move. For the list
+    engine it also holds the taken positions and their stamps, in the order they were taken.
+    """
+    __slots__ = ('color', 'position', 'flipped', 'taken', 'stamps', 'frontier', 'legal_positions', 'geometry')
+
+    def __init__(self, color, position, frontier, legal_positions, geometry):
+        self.color = color
+        self.position = position
+        self.flipped = 0    # bitboard of the taken pieces
+        self.taken = ()
+        self.stamps = ()
+        self.frontier = frontier
+        self.legal_positions = legal_positions
+        self.geometry = geometry    # the game's bitboard.BoardGeometry
+
+    def get_taken_positions(self):
+        """
+        Returns the positions of the pieces taken by the move.
+        :return: list of (row, column) positions in row-major order
+        """
+        return [self.geometry.index_to_square(index) for index in bitboard.iter_indexes(self.flipped)]
+
+
 class Othello:
     """
     This class begins, controls, and ends a game of Othello, following the classic rules. This
@@ -56,23 +95,82 @@ class Othello:
         Showing the available positions a Player can move to.
         Making a move and updating the board accordingly.
         Telling the player if they're making an invalid move or telling them there are no more valid moves.
+    The rules can be run by one of two engines, chosen when the game is created:
+        'list' - the original engine, which follows each color's list of positions across the board.
+        'bitboard' - each color is held in an integer bitboard and moves/flips come from shift-and-mask
+            operations and ray tables (see bitboard.py). Positions are returned in row-major order
+            without duplicates. This is the engine to use on large boards.
+    Passing verbose=False stops play_game() from printing; its return values are unchanged.
+    The board is 8x8 unless another even size of 4 or more is given, e.g. Othello(size=12). The
+    four starting pieces are always in the middle. Searching, endgame solving and opening books
+    are only available on the 8x8 board.
     """
-    def __init__(self):
-        self._board = [['*', '*', '*', '*', '*', '*', '*', '*', '*', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', 'O', 'X', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', 'X', 'O', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '.', '.', '.', '.', '.', '.', '.', '.', '*'],
-                       ['*', '*', '*', '*', '*', '*', '*', '*', '*', '*']]
+    def __init__(self, engine='list', verbose=True, size=8):
+        if engine not in ('list', 'bitboard'):
+            raise ValueError(f"engine must be 'list' or 'bitboard', not {engine!r}")
+        if size < 4 or size % 2:
+            raise ValueError(f'size must be an even number of at least 4, not {size!r}')
+        self._engine = engine
+        self._verbose = verbose
+        self._size = size
+        self._geometry = bitboard.get_geometry(size)
+        # the board has a border of '*' around it, so positions run from 1 to size
+        self._board = [['*'] * (size + 2)]
+        for _ in range(size):
+            self._board.append(['*'] + ['.'] * size + ['*'])
+        self._board.append(['*'] * (size + 2))
+        middle = size // 2
+        self._board[middle][middle] = self._board[middle + 1][middle + 1] = 'O'
+        self._board[middle][middle + 1] = self._board[middle + 1][middle] = 'X'
         self._players = {}
+        # list engine only: each color's positions map to the stamp (0, 1, 2...) recording the order
+        # they were added; dicts keep that order and let taken pieces be removed without searching
         self._positions = {
-            'black': [(4, 5), (5, 4)],
-            'white': [(4, 4), (5, 5)]
+            'black': {(middle, middle + 1): 0, (middle + 1, middle): 1},
+            'white': {(middle, middle): 2, (middle + 1, middle + 1): 3}
+        }
+        self._stamp = 4
+        # colors whose positions unmake_move() has put back out of stamp order; they are put back
+        # in order by self._ordered_positions() only when the order is needed
+        self._unordered = set()
+        # the list engine works from self._positions; both engines keep self._bitboards current
+        geometry = self._geometry
+        self._bitboards = {
+            'black': geometry.square_to_bit(middle, middle + 1) | geometry.square_to_bit(middle + 1, middle),
+            'white': geometry.square_to_bit(middle, middle) | geometry.square_to_bit(middle + 1, middle + 1)
         }
+        # empty squares touching at least one piece; only these can ever be legal moves
+        occupied = self._bitboards['black'] | self._bitboards['white']
+        self._frontier = geometry.neighbours(occupied) & ~occupied
+        # color -> set of legal positions, filled in lazily and emptied by every move
+        self._legal_positions = {}
+        self._search_engine = None   # created by the first call to self.best_move()
+        # valid play_game() moves as (color, position); a position of None marks a pass
+        self._history = []
+        self._instrumentation = None    # created by self.enable_instrumentation()
+
+    def __getstate__(self):
+        """
+        Returns the attributes to copy when the game is copied with copy.deepcopy() or pickled,
+        leaving out the instrumentation wrappers, which call the original game's methods.
+        :return: dict of attributes
+        """
+        state = dict(self.__dict__)
+        for name in TIMED_METHODS:
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the attributes of a copied game. If the original was instrumented, the copy's
+        own methods are instrumented, carrying on from a copy of what was recorded so far.
+        :param state: dict of attributes from self.__getstate__()
+        :return: None
+        """
+        self.__dict__.update(state)
+        # a shallow copy shares the original's instrumentation, which stays with the original
+        if self._instrumentation is not None and self._instrumentation._game is self:
+            self._instrumentation.rebind()
 
     def print_board(self):
         """
@@ -121,11 +219,52 @@ class Othello:
         else:
             return "Winner is white player: " + self._players['white'].get_name()
 
+    def return_scores(self):
+        """
+        Returns the number of pieces each color has on the board.
+        :return: dict of 'black' and 'white' piece counts
+        """
+        return {'black': self._bitboards['black'].bit_count(), 'white': self._bitboards['white'].bit_count()}
+
+    def return_bitboards(self):
+        """
+        Returns each color's pieces as a bitboard, with bit (row - 1) * size + (column - 1) set
+        for a piece at (row, column) (see bitboard.py). Both engines keep the bitboards current.
+        :return: dict of 'black' and 'white' bitboards
+        """
+        return dict(self._bitboards)
+
+    def return_size(self):
+        """
+        Returns the number of rows (and columns) on the board.
+        :return: board size, 8 unless another size was given
+        """
+        return self._size
+
+    def _require_standard_board(self, feature):
+        """
+        Raises ValueError for features that only work on the 8x8 board.
+        :param feature: name of the feature, for the error message
+        :return: None
+        """
+        if self._size != 8:
+            raise ValueError(f'{feature} only support the 8x8 board, not {self._size}x{self._size}')
+
+    def return_history(self):
+        """
+        Returns the valid moves made through self.play_game(), in order. When a color moves
+        twice in a row because the other color had no valid move, a pass is recorded for the
+        other color in between.
+        :return: list of (color, position) moves; position is None for a pass
+        """
+        return list(self._history)
+
     def rec_available_positions(self, row, column, direction, opponent):
         """
         Recursively increments the row or column in the prescribed direction until either an
         empty space is encountered '.', which means it's a valid move, or a '*' or a piece of
         the same color is encountered, in which case it's an invalid move.
+        Each call moves one square, so the recursion is never deeper than the board is wide.
         :param row: the board[x] position of the opponents piece. Passed by return_available_positions
                     method
         :param column: the board[][x] position of the opponents piece. Passed by return_available_positions
@@ -150,76 +289,111 @@ class Othello:
             if self._board[row][column] == 'X':  # if same piece is encountered, not valid
                 return
 
-        if direction == 'north':
-            return self.rec_available_positions(row - 1, column, 'north', opponent)
-        if direction == 'south':
-            return self.rec_available_positions(row + 1, column, 'south', opponent)
-        if direction == 'east':
-            return self.rec_available_positions(row, column + 1, 'east', opponent)
-        if direction == 'west':
-            return self.rec_available_positions(row, column - 1, 'west', opponent)
-        if direction == 'northeast':
-            return self.rec_available_positions(row - 1, column + 1, 'northeast', opponent)
-        if direction == 'northwest':
-            return self.rec_available_positions(row - 1, column - 1, 'northwest', opponent)
-        if direction == 'southeast':
-            return self.rec_available_positions(row + 1, column + 1, 'southeast', opponent)
-        if direction == 'southwest':
-            return self.rec_available_positions(row + 1, column - 1, 'southwest', opponent)
-
-    def return_available_positions(self, color):
+        row_step, column_step = DIRECTION_STEPS[direction]
+        return self.rec_available_positions(row + row_step, column + column_step, direction, opponent)
+
+    def return_available_positions(self, color, book=None):
         """
         Finds and returns a list of all available position for a Player of a specific
         color to move.
         This can be called by the User or by self.play_game().
         :param color: color of a Player object's pieces.
+        :param book: optional book.OpeningBook; when given, only the available positions the
+                book has played are returned, annotated with the book's statistics
         :return: List of valid positions for a Player color pieces to move.
                 List is empty if there are no valid moves.
+                With a book, a list of (position, games, win rate) with the best win rate first.
         """
         opponent = 'white' if color == 'black' else 'black'
+        if book is not None:
+            self._require_standard_board('opening books')
+            return book.return_book_moves(self._bitboards['black'], self._bitboards['white'], color)
+        if self._engine == 'bitboard':
+            return sorted(self._legal_position_set(color))
 
         positions_list = []
-        for pos in self._positions[color]:  # each position for a player may have possible moves
-            row = pos[0]
-            column = pos[1]
-            for opp_pos in self._positions[opponent]:  # possible moves are based on positions of opponent's pieces
-                opp_row = opp_pos[0]
-                opp_column = opp_pos[1]
-                # horizontal movement check
-                if opp_row == row and opp_column - column == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'east', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                elif opp_row == row and column - opp_column == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'west', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                # vertical movement check
-                elif opp_column == column and opp_row - row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'south', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                elif opp_column == column and row - opp_row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'north', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                # diagonal movement check
-                elif opp_column - column == 1 and opp_row - row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'southeast', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                elif opp_column - column == 1 and row - opp_row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'northeast', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                elif column - opp_column == 1 and opp_row - row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'southwest', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
-                elif column - opp_column == 1 and row - opp_row == 1:
-                    possible_positions = self.rec_available_positions(opp_row, opp_column, 'northwest', opponent)
-                    positions_list.append(possible_positions) if possible_positions else []
+        opp_positions = self._positions[opponent]
+        for pos in self._ordered_positions(color):  # each position for a player may have possible moves
+            # possible moves are based on the opponent's pieces next to it, taken in the order
+            # the opponent's pieces were placed
+            for opp_pos, direction in self._adjacent_positions(pos, opp_positions):
+                possible_positions = self.rec_available_positions(opp_pos[0], opp_pos[1], direction, opponent)
+                positions_list.append(possible_positions) if possible_positions else []
 
         return positions_list
 
+    def _adjacent_positions(self, piece_position, positions):
+        """
+        Finds the squares next to a position that hold one of the given pieces, for the list
+        engine. Only the eight neighbouring squares are looked up, so the cost doesn't grow with
+        the number of pieces.
+        :param piece_position: (row, column) position
+        :param positions: a color's positions, mapped to their stamps (see self._add_position())
+        :return: list of ((row, column), direction) pairs, in the order the pieces were placed
+        """
+        row, column = piece_position
+        adjacent = []
+        for direction, (row_step, column_step) in DIRECTION_STEPS.items():
+            neighbour = (row + row_step, column + column_step)
+            stamp = positions.get(neighbour)
+            if stamp is not None:
+                adjacent.append((stamp, neighbour, direction))
+        adjacent.sort()
+        return [(neighbour, direction) for _, neighbour, direction in adjacent]
+
+    def _legal_position_set(self, color):
+        """
+        Returns the set of legal positions for a color. The set is worked out from the bitboards
+        the first time it's asked for after a move and then reused until the next move, so
+        play_game() can validate a move and check for the end of the game with set lookups.
+        :param color: color of a Player object's pieces.
+        :return: set of (row, column) positions; empty if there are no valid moves.
+        """
+        legal = self._legal_positions.get(color)
+        if legal is None:
+            opponent = 'white' if color == 'black' else 'black'
+            moves = self._geometry.legal_moves(self._bitboards[color], self._bitboards[opponent]) & self._frontier
+            legal = {self._geometry.index_to_square(index) for index in bitboard.iter_indexes(moves)}
+            self._legal_positions[color] = legal
+        return legal
+
+    def _is_legal_position(self, color, piece_position):
+        """
+        Checks a position against the legal positions for a color.
+        :param color: color of a Player object's pieces.
+        :param piece_position: the position to check, normally a (row, column) tuple
+        :return: True if the move is valid, otherwise False
+        """
+        try:
+            return piece_position in self._legal_position_set(color)
+        except TypeError:   # unhashable positions (e.g. lists) are never valid, as before
+            return False
+
+    def return_frontier_positions(self):
+        """
+        Returns the empty squares that touch at least one piece. The frontier is kept up to
+        date by each move, which only ever changes the squares around the placed piece.
+        :return: List of (row, column) positions in row-major order.
+        """
+        return [self._geometry.index_to_square(index) for index in bitboard.iter_indexes(self._frontier)]
+
+    def _track_move(self, move):
+        """
+        Updates the move-tracking state after a piece has been placed: the placed square leaves
+        the frontier, its empty neighbours join it, and the cached legal positions are dropped.
+        :param move: single-bit mask of the square the piece was placed on
+        :return: None
+        """
+        occupied = self._bitboards['black'] | self._bitboards['white']
+        self._frontier = (self._frontier | self._geometry.neighbours(move)) & ~occupied
+        self._legal_positions = {}  # a new dict, since the old one may be held by a MoveDelta
+
     def rec_make_move(self, opp_row, opp_column, direction, opponent, pieces_list=None):
         """
         Recursively increments the row or column in the prescribed direction until either a
         piece of the same color is encountered '.', which means it's a valid move, or a '*' or a piece of
         the opposite color is encountered, in which case it's an invalid move.
+        Each call moves one square, so the recursion is never deeper than the board is wide.
         :param opp_row: starting position for the opponent's piece
         :param opp_column: starting positions for the opponent's piece
         :param direction: any of the cardinal directions (north, south, east, west, northeast, southeast,
@@ -245,22 +419,8 @@ class Othello:
         else:
             pieces_list.append((opp_row, opp_column))  # add the current piece position
             # continues recursively while the position holds the opponent's mark
-            if direction == 'north':
-                return self.rec_make_move(opp_row - 1, opp_column, 'north', opponent, pieces_list)
-            if direction == 'south':
-                return self.rec_make_move(opp_row + 1, opp_column, 'south', opponent, pieces_list)
-            if direction == 'east':
-                return self.rec_make_move(opp_row, opp_column + 1, 'east', opponent, pieces_list)
-            if direction == 'west':
-                return self.rec_make_move(opp_row, opp_column - 1, 'west', opponent, pieces_list)
-            if direction == 'northeast':
-                return self.rec_make_move(opp_row - 1, opp_column + 1, 'northeast', opponent, pieces_list)
-            if direction == 'northwest':
-                return self.rec_make_move(opp_row - 1, opp_column - 1, 'northwest', opponent, pieces_list)
-            if direction == 'southeast':
-                return self.rec_make_move(opp_row + 1, opp_column + 1, 'southeast', opponent, pieces_list)
-            if direction == 'southwest':
-                return self.rec_make_move(opp_row + 1, opp_column - 1, 'southwest', opponent, pieces_list)
+            row_step, column_step = DIRECTION_STEPS[direction]
+            return self.rec_make_move(opp_row + row_step, opp_column + column_step, direction, opponent, pieces_list)
 
     def make_move(self, color, piece_position):
         """
@@ -273,6 +433,19 @@ class Othello:
         :param piece_position: destination position (validity not checked)
         :return: the current board as a 2D list
         """
+        self.apply_move(color, piece_position)
+        return self._board
+
+    def apply_move(self, color, piece_position):
+        """
+        Makes a move exactly like self.make_move(), but returns a MoveDelta recording the
+        placed piece and the taken pieces instead of the board. Passing the delta to
+        self.unmake_move() takes the move back, so a move can be tried and undone without
+        copying the whole game.
+        :param color: color of the Player object's piece that is making the move
+        :param piece_position: destination position (validity not checked)
+        :return: MoveDelta for the move
+        """
         # get info for the player and their opponent
         opponent = 'black' if color == 'white' else 'white'
         mark = 'O' if color == 'white' else 'X'
@@ -280,51 +453,218 @@ class Othello:
         #   add the initial mark to the board, the position of their piece to the list, and increment number of pieces
         row = piece_position[0]
         column = piece_position[1]
+        if self._engine == 'bitboard':
+            return self._apply_bitboard_move(color, opponent, mark, row, column)
+        delta = MoveDelta(color, piece_position, self._frontier, self._legal_positions, self._geometry)
         self._board[row][column] = mark
-        self._positions[color].append(piece_position)
+        self._add_position(color, piece_position)
         self._players[color].change_pieces(1)
+        self._bitboards[color] |= self._geometry.square_to_bit(row, column)
 
         taken_pieces_list = []      # holds all the piece positions to be converted to the other color
-        for opp_pos in self._positions[opponent]:  # each opponent position is compared to argument position
-            opp_row = opp_pos[0]
-            opp_column = opp_pos[1]
-            # horizontal movement check
-            if opp_row == row and opp_column - column == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'east', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            elif opp_row == row and column - opp_column == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'west', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            # vertical movement check
-            elif opp_column == column and opp_row - row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'south', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            elif opp_column == column and row - opp_row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'north', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            # diagonal movement check
-            elif opp_column - column == 1 and opp_row - row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'southeast', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            elif opp_column - column == 1 and row - opp_row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'northeast', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            elif column - opp_column == 1 and opp_row - row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'southwest', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
-            elif column - opp_column == 1 and row - opp_row == 1:
-                possible_positions = self.rec_make_move(opp_row, opp_column, 'northwest', opponent)
-                taken_pieces_list += possible_positions if possible_positions else []
+        # each opponent piece next to the argument position may start a line of taken pieces
+        for opp_pos, direction in self._adjacent_positions(piece_position, self._positions[opponent]):
+            possible_positions = self.rec_make_move(opp_pos[0], opp_pos[1], direction, opponent)
+            taken_pieces_list += possible_positions if possible_positions else []
 
+        stamps = []     # the opponent's stamps, so unmake_move() can put the pieces back in order
         for pos in taken_pieces_list:   # complete the move by transferring all marks/positions
             row = pos[0]
             column = pos[1]
             self._board[row][column] = mark
-            self._positions[color].append(pos)
-            self._positions[opponent].remove(pos)
+            self._add_position(color, pos)
+            stamps.append(self._positions[opponent].pop(pos))
             self._players[color].change_pieces(1)
             self._players[opponent].change_pieces(-1)
-        return self._board
+            delta.flipped |= self._geometry.square_to_bit(row, column)
+        self._bitboards[color] |= delta.flipped
+        self._bitboards[opponent] ^= delta.flipped
+        delta.taken = tuple(taken_pieces_list)
+        delta.stamps = tuple(stamps)
+        self._track_move(self._geometry.square_to_bit(piece_position[0], piece_position[1]))
+        return delta
+
+    def _apply_bitboard_move(self, color, opponent, mark, row, column):
+        """
+        The bitboard engine's version of apply_move. The flips are found with the board geometry's flips()
+        and only the changed squares of self._board are rewritten, so print_board() and the
+        returned board stay in step with the bitboards.
+        :param color: color of the Player object's piece that is making the move
+        :param opponent: the other color
+        :param mark: 'X' or 'O' for the moving color
+        :param row: destination row (validity not checked)
+        :param column: destination column (validity not checked)
+        :return: MoveDelta for the move
+        """
+        delta = MoveDelta(color, (row, column), self._frontier, self._legal_positions, self._geometry)
+        move = self._geometry.square_to_bit(row, column)
+        flipped = self._geometry.flips(self._bitboards[color], self._bitboards[opponent], move)
+        self._bitboards[color] |= move | flipped
+        self._bitboards[opponent] ^= flipped
+        delta.flipped = flipped
+
+        self._board[row][column] = mark
+        for index in bitboard.iter_indexes(flipped):
+            flipped_row, flipped_column = self._geometry.index_to_square(index)
+            self._board[flipped_row][flipped_column] = mark
+        taken = flipped.bit_count()
+        self._players[color].change_pieces(1 + taken)
+        self._players[opponent].change_pieces(-taken)
+        self._track_move(move)
+        return delta
+
+    def unmake_move(self, delta):
+        """
+        Takes back a move made by self.apply_move(), restoring the board, positions, piece
+        counts and move-tracking state to exactly what they were before it. Deltas must be
+        undone in the reverse order the moves were made.
+        :param delta: the MoveDelta returned by self.apply_move()
+        :return: None
+        """
+        color = delta.color
+        opponent = 'black' if color == 'white' else 'white'
+        opp_mark = 'X' if color == 'white' else 'O'
+        row, column = delta.position
+        flipped = delta.flipped
+        taken = flipped.bit_count()
+
+        self._board[row][column] = '.'
+        for index in bitboard.iter_indexes(flipped):
+            flipped_row, flipped_column = self._geometry.index_to_square(index)
+            self._board[flipped_row][flipped_column] = opp_mark
+        self._bitboards[color] ^= self._geometry.square_to_bit(row, column) | flipped
+        self._bitboards[opponent] |= flipped
+        self._players[color].change_pieces(-1 - taken)
+        self._players[opponent].change_pieces(taken)
+        self._frontier = delta.frontier
+        self._legal_positions = delta.legal_positions
+
+        if self._engine == 'list':
+            # the moved color's new positions were the last ones added, so removing them
+            # leaves its positions in their old order
+            color_positions = self._positions[color]
+            for pos in delta.taken:
+                del color_positions[pos]
+            del color_positions[delta.position]
+            self._stamp -= 1 + taken
+            if taken:
+                # the taken pieces go back at the end; the order is only restored when needed
+                self._positions[opponent].update(zip(delta.taken, delta.stamps))
+                self._unordered.add(opponent)
+
+    def _add_position(self, color, piece_position):
+        """
+        Adds a position to a color's positions for the list engine. Each position is stored
+        with an increasing stamp, which records the order the positions were added in.
+        :param color: color of the piece
+        :param piece_position: (row, column) of the piece
+        :return: None
+        """
+        self._positions[color][piece_position] = self._stamp
+        self._stamp += 1
+
+    def _ordered_positions(self, color):
+        """
+        Returns a color's positions for the list engine in the order they were added, first
+        re-sorting them by stamp if unmake_move() has put taken pieces back since the last time.
+        :param color: color of the pieces
+        :return: dict of (row, column) positions mapped to their stamps
+        """
+        if color in self._unordered:
+            positions = self._positions[color]
+            self._positions[color] = dict(sorted(positions.items(), key=lambda item: item[1]))
+            self._unordered.discard(color)
+        return self._positions[color]
+
+    def best_move(self, color, depth=None, time_budget_ms=1000, book=None):
+        """
+        Suggests a move for a color using the search engine in search.py (iterative-deepening
+        alpha-beta with a transposition table). The board is not changed. The engine and its
+        transposition table are kept for later calls on this game.
+        :param color: color of the Player object's pieces to suggest a move for
+        :param depth: how many moves ahead to search; None keeps deepening until time runs out
+        :param time_budget_ms: time limit in milliseconds, or None for no limit
+        :param book: optional book.OpeningBook; if the position is in the book, its best move is
+                returned without searching (and the search stats are left unchanged)
+        :return: the suggested (row, column) position, or None if there are no valid moves
+        """
+        self._require_standard_board('searches')
+        if book is not None:
+            book_moves = self.return_available_positions(color, book)
+            if book_moves:
+                return book_moves[0][0]
+        if self._search_engine is None:
+            self._search_engine = SearchEngine()
+        index, score = self._search_engine.search(self._bitboards['black'], self._bitboards['white'],
+                                                  color, depth, time_budget_ms)
+        return None if index is None else self._geometry.index_to_square(index)
+
+    def return_search_stats(self):
+        """
+        Returns statistics about the last self.best_move() search: depth reached, score, nodes,
+        nodes per second and transposition table hit rate (see SearchEngine.get_stats()).
+        :return: dict of statistics; empty if no search has been made
+        """
+        if self._search_engine is None:
+            return {}
+        return self._search_engine.get_stats()
+
+    def solve_endgame(self, color):
+        """
+        Plays the rest of the game out perfectly for both sides (see endgame.py) and returns the
+        result. The board is not changed. The game ends the same way as in self.play_game(),
+        when neither color has a valid move. This is meant for roughly 18 or fewer empty
+        squares; with more it can take a very long time.
+        :param color: color of the Player object's pieces that moves next
+        :return: (final number of pieces of `color` minus the opponent's, best (row, column)
+                 position); the position is None if `color` has no valid moves
+        """
+        self._require_standard_board('endgame solves')
+        opponent = 'white' if color == 'black' else 'black'
+        differential, index = EndgameSolver().solve(self._bitboards[color], self._bitboards[opponent])
+        return differential, None if index is None else self._geometry.index_to_square(index)
+
+    def enable_instrumentation(self, callback=None):
+        """
+        Starts counting and timing this game's rules methods (see instrument.py). Until this is
+        called the methods run with no instrumentation at all.
+        :param callback: optional function called after every timed call with (method name,
+                elapsed nanoseconds, return value), e.g. to feed a metrics exporter
+        :return: None
+        """
+        if self._instrumentation is None:
+            self._instrumentation = Instrumentation(self)
+        self._instrumentation.install()
+        if callback is not None:
+            self._instrumentation.add_callback(callback)
+
+    def disable_instrumentation(self):
+        """
+        Stops instrumenting this game. What was recorded is kept for self.stats() until
+        self.reset_stats() is called.
+        :return: None
+        """
+        if self._instrumentation is not None:
+            self._instrumentation.uninstall()
+
+    def reset_stats(self):
+        """
+        Clears what the instrumentation has recorded so far.
+        :return: None
+        """
+        if self._instrumentation is not None:
+            self._instrumentation.reset()
+
+    def stats(self):
+        """
+        Returns a snapshot of what the instrumentation has recorded: calls and times per method,
+        recursion depths, flips per move, branching factor, duplicate available positions and
+        play_game() results (see Instrumentation.snapshot()).
+        :return: dict of statistics; empty if instrumentation was never enabled
+        """
+        if self._instrumentation is None:
+            return {}
+        return self._instrumentation.snapshot()
 
     def play_game(self, player_color, piece_position):
         """
@@ -336,6 +676,9 @@ class Othello:
         Valid moves will update the board and make the move via self.make_move().
         If the last valid move was made, then the scores will be displayed and
         self.return_winner() will be called.
+        Validity and the end of the game are checked against the cached legal position sets
+        (see self._legal_position_set()) rather than by rescanning the board.
+        Nothing is printed if the game was created with verbose=False.
         :param player_color: Color of the piece being moved
         :param piece_position: Destination position of the piece
         :return: "Invalid move" if invalid move was made. Prints valid moves in this case.
@@ -346,18 +689,23 @@ class Othello:
 
         opponent = 'black' if player_color == 'white' else 'white'  # define player color variables
         # check if move was valid
-        available_positions = self.return_available_positions(player_color)
-        if piece_position in available_positions:
+        if self._is_legal_position(player_color, piece_position):
+            # a color moving twice in a row means the other color had to pass
+            if self._history and self._history[-1][0] == player_color and not self._legal_position_set(opponent):
+                self._history.append((opponent, None))
+            self._history.append((player_color, piece_position))
             # pass to make_move method
             self.make_move(player_color, piece_position)
             # check if either black or white have valid moves remaining
-            if (self.return_available_positions(player_color) == [] and
-                    self.return_available_positions(opponent) == []):
+            if (not self._legal_position_set(player_color) and
+                    not self._legal_position_set(opponent)):
                 # tally scores and end game
                 white_score = self._players['white'].get_pieces()
                 black_score = self._players['black'].get_pieces()
-                print(f'Game is ended white piece: {white_score} black piece: {black_score}')
+                if self._verbose:
+                    print(f'Game is ended white piece: {white_score} black piece: {black_score}')
                 return self.return_winner()
         else:   # invalid move selected
-            print(f'Here are the valid moves: {self.return_available_positions(player_color)}.')
+            if self._verbose:
+                print(f'Here are the valid moves: {self.return_available_positions(player_color)}.')
             return "Invalid move"
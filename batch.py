@@ -0,0 +1,218 @@
+# Description: Vectorized Othello for running many independent games at once. BatchOthello holds
+#           N games as NumPy arrays of 64-bit bitboards (the same square layout as bitboard.py)
+#           and finds legal moves, applies moves and flips, handles passes and detects the end
+#           of every game with whole-array operations instead of one Othello object per game.
+#           Requires NumPy.
+
+import numpy as np
+
+import bitboard
+
+BLACK = 0
+WHITE = 1
+
+_LEFT_SHIFTS = tuple((np.uint64(amount), np.uint64(mask)) for amount, mask in bitboard.LEFT_SHIFTS)
+_RIGHT_SHIFTS = tuple((np.uint64(amount), np.uint64(mask)) for amount, mask in bitboard.RIGHT_SHIFTS)
+_ONE = np.uint64(1)
+_ZERO = np.uint64(0)
+
+
+def popcount(boards):
+    """
+    Counts the set bits of every bitboard in an array.
+    :param boards: uint64 array of shape (N,)
+    :return: int64 array of shape (N,)
+    """
+    return bit_planes(boards).sum(axis=1, dtype=np.int64)
+
+
+def bit_planes(boards):
+    """
+    Expands bitboards into one 0/1 column per square, so column i is bit i
+    (square (i // 8 + 1, i % 8 + 1)).
+    :param boards: uint64 array of shape (N,)
+    :return: uint8 array of shape (N, 64)
+    """
+    as_bytes = np.ascontiguousarray(boards, dtype='<u8').view(np.uint8).reshape(-1, 8)
+    return np.unpackbits(as_bytes, axis=1, bitorder='little')
+
+
+def legal_moves(own, opp):
+    """
+    The array version of bitboard.legal_moves().
+    :param own: uint64 array of the moving side's bitboards
+    :param opp: uint64 array of the other side's bitboards
+    :return: uint64 array of legal-move bitboards
+    """
+    empty = ~(own | opp)
+    moves = np.zeros_like(own)
+    for amount, mask in _LEFT_SHIFTS:
+        inner = opp & mask
+        run = (own << amount) & inner
+        for _ in range(5):
+            run |= (run << amount) & inner
+        moves |= (run << amount) & mask
+    for amount, mask in _RIGHT_SHIFTS:
+        inner = opp & mask
+        run = (own >> amount) & inner
+        for _ in range(5):
+            run |= (run >> amount) & inner
+        moves |= (run >> amount) & mask
+    return moves & empty
+
+
+def flips(own, opp, move):
+    """
+    The array version of bitboard.flips(). Games whose move is 0 take nothing.
+    :param own: uint64 array of the moving side's bitboards
+    :param opp: uint64 array of the other side's bitboards
+    :param move: uint64 array holding a single-bit move (or 0) per game
+    :return: uint64 array of the pieces that change color
+    """
+    flipped = np.zeros_like(own)
+    for shifts, shift in ((_LEFT_SHIFTS, np.left_shift), (_RIGHT_SHIFTS, np.right_shift)):
+        for amount, mask in shifts:
+            line = np.zeros_like(own)
+            square = shift(move, amount) & mask & opp
+            for _ in range(6):     # a line holds at most six opponent pieces
+                line |= square
+                square = shift(square, amount) & mask
+                flipped |= np.where(square & own, line, _ZERO)
+                square &= opp
+    return flipped
+
+
+def neighbours(boards):
+    """
+    The array version of bitboard.neighbours().
+    :param boards: uint64 array of bitboards
+    :return: uint64 array of the squares touching each bitboard's set squares
+    """
+    adjacent = np.zeros_like(boards)
+    for amount, mask in _LEFT_SHIFTS:
+        adjacent |= (boards << amount) & mask
+    for amount, mask in _RIGHT_SHIFTS:
+        adjacent |= (boards >> amount) & mask
+    return adjacent
+
+
+class BatchOthello:
+    """
+    This class plays N games of Othello in lockstep. Unlike Othello, turn order is enforced:
+    black moves first, the turn passes automatically when the side to move has no valid move,
+    and a game is finished when neither side can move. Scores are the piece counts at that
+    point, exactly as in Othello.play_game().
+    Moves are square indexes, (row - 1) * 8 + (column - 1), with -1 for "no move".
+    """
+    def __init__(self, count):
+        self._count = count
+        self._games = np.arange(count)
+        # boards[BLACK] and boards[WHITE] are each color's bitboards, one per game
+        self._boards = np.empty((2, count), dtype=np.uint64)
+        self._boards[BLACK] = np.uint64(bitboard.square_to_bit(4, 5) | bitboard.square_to_bit(5, 4))
+        self._boards[WHITE] = np.uint64(bitboard.square_to_bit(4, 4) | bitboard.square_to_bit(5, 5))
+        self._to_move = np.full(count, BLACK, dtype=np.int8)
+        self._finished = np.zeros(count, dtype=bool)
+        self._legal = legal_moves(self._boards[BLACK], self._boards[WHITE])
+
+    def __len__(self):
+        return self._count
+
+    def return_boards(self):
+        """
+        Returns copies of the black and white bitboards of every game.
+        :return: (black, white) uint64 arrays of shape (N,)
+        """
+        return self._boards[BLACK].copy(), self._boards[WHITE].copy()
+
+    def return_to_move(self):
+        """
+        Returns the color to move in every game (BLACK or WHITE; meaningless once finished).
+        :return: int8 array of shape (N,)
+        """
+        return self._to_move.copy()
+
+    def return_finished(self):
+        """
+        Returns which games are over.
+        :return: bool array of shape (N,)
+        """
+        return self._finished.copy()
+
+    def return_legal_moves(self):
+        """
+        Returns the legal-move bitboard for the side to move in every game (0 once finished).
+        :return: uint64 array of shape (N,)
+        """
+        return self._legal.copy()
+
+    def return_scores(self):
+        """
+        Returns the number of pieces of each color in every game.
+        :return: (black, white) int64 arrays of shape (N,)
+        """
+        return popcount(self._boards[BLACK]), popcount(self._boards[WHITE])
+
+    def return_winners(self):
+        """
+        Returns the result of every game by piece count: BLACK, WHITE, or -1 for a tie.
+        Only meaningful for finished games.
+        :return: int8 array of shape (N,)
+        """
+        black, white = self.return_scores()
+        return np.where(black > white, BLACK, np.where(white > black, WHITE, -1)).astype(np.int8)
+
+    def random_moves(self, rng):
+        """
+        Picks a uniformly random legal move for the side to move in every game.
+        :param rng: numpy.random.Generator
+        :return: int64 array of square indexes, -1 where there is no move
+        """
+        planes = bit_planes(self._legal)
+        choice = np.argmax(rng.random(planes.shape) * planes, axis=1)
+        return np.where(self._legal != 0, choice, -1)
+
+    def make_moves(self, moves):
+        """
+        Plays one move in every unfinished game, then hands the turn to the other side, or back
+        if the other side has to pass, and marks games where neither side can move as finished.
+        :param moves: int array of square indexes, one per game; ignored for finished games
+        :return: uint64 array of the pieces taken in each game
+        """
+        moves = np.asarray(moves, dtype=np.int64)
+        active = ~self._finished
+        on_board = (moves >= 0) & (moves < 64)
+        move = np.where(active & on_board, _ONE << np.where(on_board, moves, 0).astype(np.uint64), _ZERO)
+        illegal = active & (move & self._legal == 0)
+        if illegal.any():
+            raise ValueError(f"illegal move in games {np.flatnonzero(illegal).tolist()}")
+
+        mover = self._to_move
+        other = 1 - mover
+        own = self._boards[mover, self._games]
+        opp = self._boards[other, self._games]
+        flipped = flips(own, opp, move)
+        own |= move | flipped
+        opp ^= flipped
+        self._boards[mover, self._games] = own
+        self._boards[other, self._games] = opp
+
+        # the other side moves next if it can; otherwise the mover goes again, or the game ends
+        other_legal = legal_moves(opp, own)
+        own_legal = legal_moves(own, opp)
+        pass_back = active & (other_legal == 0)
+        self._to_move = np.where(active & ~pass_back, other, mover).astype(np.int8)
+        self._legal = np.where(pass_back, own_legal, other_legal)
+        self._finished |= active & (self._legal == 0)
+        self._legal[self._finished] = 0
+        return flipped
+
+    def play_random(self, rng):
+        """
+        Plays uniformly random legal moves in every game until all of them are finished.
+        :param rng: numpy.random.Generator
+        :return: (black, white) piece counts, as from self.return_scores()
+        """
+        while not self._finished.all():
+            self.make_moves(self.random_moves(rng))
+        return self.return_scores()
@@ -0,0 +1,414 @@
+# Description: Benchmarks and correctness checks for the Othello rules engines. Measures perft
+#           (leaf counts from the starting position, checked against the published values),
+#           return_available_positions and make_move calls per second, random-game throughput
+#           and memory per game object. It also cross-checks every move generator in the project
+#           against the original rec_available_positions/rec_make_move rules on random positions,
+#           on the 8x8 board and on other board sizes.
+#           Results are printed as JSON, e.g.: python benchmark.py --perft-depth 7 > results.json
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+import bitboard
+from endgame import count_flips, flips_at
+from Othello import Othello
+from server import GameServer
+from tournament import play_one_game, random_policy
+
+try:
+    import numpy as np
+    import batch
+except ImportError:     # BatchOthello needs NumPy; its checks are skipped without it
+    np = None
+    batch = None
+
+ENGINES = ('list', 'bitboard')
+
+# published Othello perft counts: a pass counts as a move, and a finished game is one leaf
+PERFT_COUNTS = {1: 4, 2: 12, 3: 56, 4: 244, 5: 1396, 6: 8200, 7: 55092, 8: 390216,
+                9: 3005288, 10: 24571284, 11: 212258800}
+
+
+def perft_bitboard(own, opp, depth, passed=False):
+    """
+    Counts the leaf positions `depth` moves ahead using the bitboard.py functions directly.
+    :param own: bitboard of the side to move
+    :param opp: bitboard of the other side
+    :param depth: number of moves (passes included) to look ahead
+    :param passed: True if the previous move was a pass
+    :return: number of leaves
+    """
+    if depth == 0:
+        return 1
+    moves = bitboard.legal_moves(own, opp)
+    if not moves:
+        if passed:  # neither side can move, the game is over
+            return 1
+        return perft_bitboard(opp, own, depth - 1, True)
+    leaves = 0
+    for index in bitboard.iter_indexes(moves):
+        move = 1 << index
+        flipped = bitboard.flips(own, opp, move)
+        leaves += perft_bitboard(opp ^ flipped, own | move | flipped, depth - 1)
+    return leaves
+
+
+def perft_game(game, color, depth, passed=False):
+    """
+    Counts the leaf positions `depth` moves ahead through the Othello API
+    (return_available_positions, apply_move and unmake_move), so it tests the engine in use.
+    :param game: Othello object with both players created
+    :param color: color to move
+    :param depth: number of moves (passes included) to look ahead
+    :param passed: True if the previous move was a pass
+    :return: number of leaves
+    """
+    if depth == 0:
+        return 1
+    opponent = 'white' if color == 'black' else 'black'
+    positions = set(game.return_available_positions(color))   # the list engine can repeat positions
+    if not positions:
+        if passed:
+            return 1
+        return perft_game(game, opponent, depth - 1, True)
+    leaves = 0
+    for position in positions:
+        delta = game.apply_move(color, position)
+        leaves += perft_game(game, opponent, depth - 1)
+        game.unmake_move(delta)
+    return leaves
+
+
+def new_game(engine):
+    """
+    Creates a quiet game with both players.
+    :param engine: Othello engine to use
+    :return: Othello object
+    """
+    game = Othello(engine, verbose=False)
+    game.create_player('black', 'black')
+    game.create_player('white', 'white')
+    return game
+
+
+def random_move_sequence(rng, length=None):
+    """
+    Plays random moves with the reference (list) engine.
+    :param rng: random.Random
+    :param length: number of moves to play; None plays to the end of the game
+    :return: list of (color, position) moves
+    """
+    game = new_game('list')
+    moves = []
+    color = 'black'
+    while length is None or len(moves) < length:
+        opponent = 'white' if color == 'black' else 'black'
+        positions = game.return_available_positions(color)
+        if not positions:
+            if not game.return_available_positions(opponent):
+                break
+        else:
+            position = rng.choice(positions)
+            game.make_move(color, position)
+            moves.append((color, position))
+        color = opponent
+    return moves
+
+
+def bench_perft(depth):
+    """
+    Runs perft from the starting position with each move generator.
+    :param depth: deepest perft to run
+    :return: dict of results per generator
+    """
+    start_black = bitboard.square_to_bit(4, 5) | bitboard.square_to_bit(5, 4)
+    start_white = bitboard.square_to_bit(4, 4) | bitboard.square_to_bit(5, 5)
+    generators = {'bitboard_functions': lambda d: perft_bitboard(start_black, start_white, d)}
+    for engine in ENGINES:
+        generators[f'othello_{engine}'] = lambda d, engine=engine: perft_game(new_game(engine), 'black', d)
+
+    results = {}
+    for name, perft in generators.items():
+        start = time.perf_counter()
+        counts = {d: perft(d) for d in range(1, depth + 1)}
+        elapsed = time.perf_counter() - start
+        nodes = sum(counts.values())
+        results[name] = {
+            'counts': counts,
+            'correct': all(PERFT_COUNTS.get(d, count) == count for d, count in counts.items()),
+            'seconds': elapsed,
+            'leaves_per_second': nodes / elapsed if elapsed else 0.0
+        }
+    return results
+
+
+def bench_calls(positions, repeat):
+    """
+    Measures return_available_positions calls, make_move calls and apply_move/unmake_move pairs
+    per second on the given positions. The bitboard engine keeps the legal positions it works
+    out until the next move, so its cache is emptied before every return_available_positions
+    call and each call does the full work. Each make_move is taken back with the delta of the
+    same move made once with apply_move beforehand, and only the make_move call is timed.
+    :param positions: list of move sequences leading to the positions
+    :param repeat: how many times to repeat each call
+    :return: dict of results per engine
+    """
+    results = {}
+    for engine in ENGINES:
+        available_time = make_time = move_time = 0.0
+        available_calls = make_calls = move_calls = 0
+        for moves in positions:
+            game = new_game(engine)
+            for color, position in moves:
+                game.make_move(color, position)
+            color = 'white' if moves[-1][0] == 'black' else 'black'
+            legal = set(game.return_available_positions(color))
+            for _ in range(repeat):
+                game._legal_positions = {}
+                start = time.perf_counter()
+                game.return_available_positions(color)
+                available_time += time.perf_counter() - start
+            available_calls += repeat
+            for position in legal:
+                delta = game.apply_move(color, position)
+                game.unmake_move(delta)
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    game.make_move(color, position)
+                    make_time += time.perf_counter() - start
+                    game.unmake_move(delta)
+                make_calls += repeat
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    game.unmake_move(game.apply_move(color, position))
+                move_time += time.perf_counter() - start
+                move_calls += repeat
+        results[engine] = {
+            'return_available_positions_per_second': available_calls / available_time if available_time else 0.0,
+            'make_move_per_second': make_calls / make_time if make_time else 0.0,
+            'apply_unmake_per_second': move_calls / move_time if move_time else 0.0
+        }
+    return results
+
+
+def bench_games(games, seed):
+    """
+    Measures how many complete random games per second each engine plays through play_game().
+    :param games: number of games per engine
+    :param seed: random seed
+    :return: dict of results per engine, plus BatchOthello if NumPy is available
+    """
+    results = {}
+    for engine in ENGINES:
+        start = time.perf_counter()
+        for number in range(games):
+            play_one_game(random_policy, random_policy, random.Random(f'{seed}:{number}'), engine)
+        elapsed = time.perf_counter() - start
+        results[engine] = {'games': games, 'seconds': elapsed, 'games_per_second': games / elapsed}
+    if batch is not None:
+        start = time.perf_counter()
+        batch.BatchOthello(games).play_random(np.random.default_rng(seed))
+        elapsed = time.perf_counter() - start
+        results['batch'] = {'games': games, 'seconds': elapsed, 'games_per_second': games / elapsed}
+    return results
+
+
+def bench_memory(count, seed):
+    """
+    Measures the memory used per game object, at the start and after 30 moves, and the same
+    for server sessions (compared with the server's own estimate from its stats).
+    :param count: number of game objects to measure over
+    :param seed: random seed
+    :return: dict of bytes per game object per engine, and per server session
+    """
+    moves = random_move_sequence(random.Random(seed), 30)
+    results = {}
+    for engine in ENGINES:
+        engine_results = {}
+        for label, sequence in (('new', []), ('after_30_moves', moves)):
+            tracemalloc.start()
+            games = []
+            for _ in range(count):
+                game = new_game(engine)
+                for color, position in sequence:
+                    game.make_move(color, position)
+                games.append(game)
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            engine_results[label] = {'bytes_per_game': current / count, 'peak_bytes_per_game': peak / count}
+            del games
+        results[engine] = engine_results
+
+    session_results = {}
+    for label, sequence in (('new', []), ('after_30_moves', moves)):
+        tracemalloc.start()
+        server = GameServer()
+        for _ in range(count):
+            session = server.handle_request({'op': 'new'})['session']
+            for color, position in sequence:
+                server.handle_request({'op': 'move', 'session': session, 'color': color, 'position': list(position)})
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        session_results[label] = {'bytes_per_session': current / count,
+                                  'estimated_bytes_per_session': server.return_stats()['bytes_per_session']}
+        del server
+    results['server_session'] = session_results
+    return results
+
+
+def board_after(engine, moves, color, position):
+    """
+    Replays moves on a new game and makes one more with make_move. With the list engine this
+    is the original recursive rules.
+    :return: the resulting board
+    """
+    game = new_game(engine)
+    for move_color, move_position in moves:
+        game.make_move(move_color, move_position)
+    return game.make_move(color, position)
+
+
+def cross_check(positions):
+    """
+    Compares every move generator in the project with the original rules (the list engine's
+    rec_available_positions/rec_make_move) on the given positions, for both colors: the set of
+    available positions, and the board after each of them.
+    :param positions: list of move sequences leading to the positions
+    :return: dict of positions checked and mismatches per generator
+    """
+    names = ['othello_bitboard', 'bitboard_functions', 'endgame_count_flips', 'endgame_flips_at', 'undo_list',
+             'undo_bitboard']
+    if batch is not None:
+        names.append('batch')
+    results = {name: {'checks': 0, 'mismatches': 0} for name in names}
+
+    def record(name, ok):
+        results[name]['checks'] += 1
+        results[name]['mismatches'] += not ok
+
+    for moves in positions:
+        reference = new_game('list')
+        bitboard_game = new_game('bitboard')
+        for color, position in moves:
+            reference.make_move(color, position)
+            bitboard_game.make_move(color, position)
+        for color in ('black', 'white'):
+            opponent = 'white' if color == 'black' else 'black'
+            own, opp = reference._bitboards[color], reference._bitboards[opponent]
+            expected = set(reference.return_available_positions(color))
+            legal = bitboard.legal_moves(own, opp)
+            record('othello_bitboard', set(bitboard_game.return_available_positions(color)) == expected)
+            record('bitboard_functions',
+                   {bitboard.index_to_square(index) for index in bitboard.iter_indexes(legal)} == expected)
+            if batch is not None:
+                batch_legal = batch.legal_moves(np.array([own], dtype=np.uint64), np.array([opp], dtype=np.uint64))
+                record('batch', int(batch_legal[0]) == legal)
+
+            for position in expected:
+                board = board_after('list', moves, color, position)
+                expected_black = sum(1 << bitboard.square_to_index(row, column)
+                                     for row in range(1, 9) for column in range(1, 9) if board[row][column] == 'X')
+                move = bitboard.square_to_bit(*position)
+                flipped = bitboard.flips(own, opp, move)
+                own_after = own | move | flipped
+                record('bitboard_functions', (own_after if color == 'black' else opp ^ flipped) == expected_black)
+                record('endgame_count_flips',
+                       count_flips(own, opp, bitboard.square_to_index(*position)) == flipped.bit_count())
+                record('endgame_flips_at', flips_at(own, opp, bitboard.square_to_index(*position)) == flipped)
+                if batch is not None:
+                    batch_flipped = batch.flips(np.array([own], dtype=np.uint64), np.array([opp], dtype=np.uint64),
+                                                np.array([move], dtype=np.uint64))
+                    record('batch', int(batch_flipped[0]) == flipped)
+
+                # apply_move/unmake_move must match make_move and leave the game untouched
+                for name, game in (('undo_list', reference), ('undo_bitboard', bitboard_game)):
+                    before = [row[:] for row in game._board]
+                    delta = game.apply_move(color, position)
+                    after = [row[:] for row in game._board]
+                    game.unmake_move(delta)
+                    record(name, after == board and game._board == before)
+                record('othello_bitboard', board_after('bitboard', moves, color, position) == board)
+    return results
+
+
+def cross_check_sizes(sizes, games, seed):
+    """
+    Compares the bitboard engine with the original rules (the list engine) on other board
+    sizes: random games are played on both, checking the available positions for both colors
+    before every move and the board after it.
+    :param sizes: board sizes to check
+    :param games: random games per size
+    :param seed: random seed
+    :return: dict of positions checked and mismatches per size
+    """
+    results = {}
+    for size in sizes:
+        checks = mismatches = 0
+        for number in range(games):
+            rng = random.Random(f'{seed}:{size}:{number}')
+            reference = Othello('list', verbose=False, size=size)
+            game = Othello('bitboard', verbose=False, size=size)
+            for each in (reference, game):
+                each.create_player('black', 'black')
+                each.create_player('white', 'white')
+            color = 'black'
+            while True:
+                opponent = 'white' if color == 'black' else 'black'
+                expected = {each_color: set(reference.return_available_positions(each_color))
+                            for each_color in (color, opponent)}
+                checks += 1
+                mismatches += any(set(game.return_available_positions(each_color)) != positions
+                                  for each_color, positions in expected.items())
+                if expected[color]:
+                    position = rng.choice(sorted(expected[color]))
+                    checks += 1
+                    mismatches += reference.make_move(color, position) != game.make_move(color, position)
+                elif not expected[opponent]:
+                    break
+                color = opponent
+        results[str(size)] = {'checks': checks, 'mismatches': mismatches}
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark and cross-check the Othello rules engines.')
+    parser.add_argument('--perft-depth', type=int, default=6, help='deepest perft to run (default 6)')
+    parser.add_argument('--positions', type=int, default=100,
+                        help='random positions for the call benchmarks and cross-checks (default 100)')
+    parser.add_argument('--repeat', type=int, default=20, help='repeats per timed call (default 20)')
+    parser.add_argument('--games', type=int, default=100, help='random games per engine (default 100)')
+    parser.add_argument('--memory-games', type=int, default=1000,
+                        help='game objects to measure memory over (default 1000)')
+    parser.add_argument('--seed', type=int, default=0, help='random seed (default 0)')
+    parser.add_argument('--sizes', default='6,10,12,16',
+                        help='other board sizes to cross-check, comma-separated (default 6,10,12,16)')
+    parser.add_argument('--size-games', type=int, default=5, help='random games per board size (default 5)')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    positions = [moves for moves in (random_move_sequence(rng, rng.randint(1, 58)) for _ in range(args.positions))
+                 if moves]
+    results = {
+        'python': sys.version.split()[0],
+        'numpy': np.__version__ if np is not None else None,
+        'perft': bench_perft(args.perft_depth),
+        'calls': bench_calls(positions, args.repeat),
+        'games': bench_games(args.games, args.seed),
+        'memory': bench_memory(args.memory_games, args.seed),
+        'cross_check': cross_check(positions),
+        'cross_check_sizes': cross_check_sizes([int(size) for size in args.sizes.split(',') if size],
+                                               args.size_games, args.seed)
+    }
+    print(json.dumps(results, indent=2))
+    failed = (any(not result['correct'] for result in results['perft'].values()) or
+              any(result['mismatches'] for result in results['cross_check'].values()) or
+              any(result['mismatches'] for result in results['cross_check_sizes'].values()))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,285 @@
+# Description: Bitboard helpers for the Othello rules engine. Each color's pieces are held in a
+#           single 64-bit integer where bit (row - 1) * 8 + (column - 1) stands for the square
+#           at (row, column) of the 10x10 sentinel board used by Othello. Legal moves and flips
+#           are found with shift-and-mask operations instead of walking the board one square at
+#           a time.
+#           The module-level functions are for the standard 8x8 board. BoardGeometry provides the
+#           same functions for any board size, using Python's arbitrary-width integers as
+#           bitboards with size * size bits.
+
+FULL_MASK = 0xFFFFFFFFFFFFFFFF
+NOT_FIRST_COLUMN = 0xFEFEFEFEFEFEFEFE  # clears squares that wrapped around onto column 1
+NOT_LAST_COLUMN = 0x7F7F7F7F7F7F7F7F  # clears squares that wrapped around onto column 8
+
+# (shift amount, wrap mask) pairs. Left shifts move towards higher bits (east/south), right
+# shifts towards lower bits (west/north). The masks also trim anything shifted past bit 63.
+LEFT_SHIFTS = ((1, NOT_FIRST_COLUMN),    # east
+               (8, FULL_MASK),           # south
+               (9, NOT_FIRST_COLUMN),    # southeast
+               (7, NOT_LAST_COLUMN))     # southwest
+RIGHT_SHIFTS = ((1, NOT_LAST_COLUMN),    # west
+                (8, FULL_MASK),          # north
+                (9, NOT_LAST_COLUMN),    # northwest
+                (7, NOT_FIRST_COLUMN))   # northeast
+
+
+def square_to_index(row, column):
+    """
+    Converts a (row, column) board position into its bit index.
+    :param row: row on the sentinel board, 1 through 8
+    :param column: column on the sentinel board, 1 through 8
+    :return: bit index, 0 through 63
+    """
+    return (row - 1) * 8 + (column - 1)
+
+
+def index_to_square(index):
+    """
+    Converts a bit index back into a (row, column) board position.
+    :param index: bit index, 0 through 63
+    :return: (row, column) tuple on the sentinel board
+    """
+    return index // 8 + 1, index % 8 + 1
+
+
+def square_to_bit(row, column):
+    """
+    Returns the single-bit mask for a (row, column) board position.
+    :param row: row on the sentinel board, 1 through 8
+    :param column: column on the sentinel board, 1 through 8
+    :return: integer with only that square's bit set
+    """
+    return 1 << ((row - 1) * 8 + (column - 1))
+
+
+def iter_indexes(board):
+    """
+    Yields the index of every set bit, lowest first (i.e., in row-major board order).
+    :param board: any bitboard
+    :return: generator of bit indexes
+    """
+    while board:
+        lowest = board & -board
+        yield lowest.bit_length() - 1
+        board ^= lowest
+
+
+def legal_moves(own, opp):
+    """
+    Finds every empty square where a piece of the `own` color would take at least one piece.
+    For each direction the own pieces are slid over runs of opponent pieces; a run that ends
+    on an empty square makes that square a legal move.
+    :param own: bitboard of the moving color
+    :param opp: bitboard of the opponent's color
+    :return: bitboard of legal moves
+    """
+    empty = ~(own | opp) & FULL_MASK
+    moves = 0
+    for amount, mask in LEFT_SHIFTS:
+        inner = opp & mask
+        run = (own << amount) & inner
+        run |= (run << amount) & inner
+        run |= (run << amount) & inner
+        run |= (run << amount) & inner
+        run |= (run << amount) & inner
+        run |= (run << amount) & inner
+        moves |= (run << amount) & mask
+    for amount, mask in RIGHT_SHIFTS:
+        inner = opp & mask
+        run = (own >> amount) & inner
+        run |= (run >> amount) & inner
+        run |= (run >> amount) & inner
+        run |= (run >> amount) & inner
+        run |= (run >> amount) & inner
+        run |= (run >> amount) & inner
+        moves |= (run >> amount) & mask
+    return moves & empty
+
+
+def flips(own, opp, move):
+    """
+    Finds the opponent pieces that would be taken by placing a piece on `move`. Validity of
+    the move is not checked; an illegal move simply takes nothing.
+    :param own: bitboard of the moving color
+    :param opp: bitboard of the opponent's color
+    :param move: single-bit mask of the destination square
+    :return: bitboard of the pieces that change color
+    """
+    flipped = 0
+    for amount, mask in LEFT_SHIFTS:
+        line = 0
+        square = (move << amount) & mask
+        while square & opp:
+            line |= square
+            square = (square << amount) & mask
+        if square & own:
+            flipped |= line
+    for amount, mask in RIGHT_SHIFTS:
+        line = 0
+        square = (move >> amount) & mask
+        while square & opp:
+            line |= square
+            square = (square >> amount) & mask
+        if square & own:
+            flipped |= line
+    return flipped
+
+
+def neighbours(board):
+    """
+    Returns every square touching at least one set square of `board`, in any of the eight
+    directions. The squares of `board` itself are only included if they touch one another.
+    :param board: any bitboard
+    :return: bitboard of the adjacent squares
+    """
+    adjacent = 0
+    for amount, mask in LEFT_SHIFTS:
+        adjacent |= (board << amount) & mask
+    for amount, mask in RIGHT_SHIFTS:
+        adjacent |= (board >> amount) & mask
+    return adjacent
+
+
+def _build_rays(size=8):
+    """
+    Builds the ray table: for every square, the squares met walking away from it in each of
+    the eight directions, nearest first, as single-bit masks. Rays shorter than two squares are
+    left out since they can never hold a taken piece and the piece that takes it.
+    :param size: number of rows (and columns) on the board
+    :return: tuple indexed by square index of tuples of rays
+    """
+    directions = ((0, 1), (1, 0), (1, 1), (1, -1), (0, -1), (-1, 0), (-1, -1), (-1, 1))
+    rays = []
+    for index in range(size * size):
+        row, column = divmod(index, size)
+        square_rays = []
+        for row_step, column_step in directions:
+            ray = []
+            ray_row, ray_column = row + row_step, column + column_step
+            while 0 <= ray_row < size and 0 <= ray_column < size:
+                ray.append(1 << (ray_row * size + ray_column))
+                ray_row += row_step
+                ray_column += column_step
+            if len(ray) >= 2:
+                square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+RAYS = _build_rays()
+
+
+class BoardGeometry:
+    """
+    This class holds the bitboard functions for one board size. Bit (row - 1) * size +
+    (column - 1) stands for the square at (row, column). Legal moves are found with the same
+    shift-and-mask method as legal_moves(), and flips by walking the precomputed rays from the
+    destination square, so a move only costs as much as the rays through it. For the 8x8 board
+    the module-level functions are used directly. Geometries are shared; use get_geometry().
+    """
+    def __init__(self, size):
+        self.size = size
+        self.squares = size * size
+        self.full_mask = (1 << self.squares) - 1
+        first_column = sum(1 << (row * size) for row in range(size))
+        not_first_column = self.full_mask & ~first_column
+        not_last_column = self.full_mask & ~(first_column << (size - 1))
+        # (shift amount, wrap mask) pairs in the same directions as LEFT_SHIFTS and RIGHT_SHIFTS
+        self.left_shifts = ((1, not_first_column), (size, self.full_mask),
+                            (size + 1, not_first_column), (size - 1, not_last_column))
+        self.right_shifts = ((1, not_last_column), (size, self.full_mask),
+                             (size + 1, not_last_column), (size - 1, not_first_column))
+        self.rays = RAYS if size == 8 else _build_rays(size)
+        if size == 8:   # the unrolled 8x8 functions give the same answers, faster
+            self.legal_moves = legal_moves
+            self.flips = flips
+            self.neighbours = neighbours
+
+    def square_to_index(self, row, column):
+        """
+        Converts a (row, column) board position into its bit index.
+        """
+        return (row - 1) * self.size + (column - 1)
+
+    def index_to_square(self, index):
+        """
+        Converts a bit index back into a (row, column) board position.
+        """
+        return index // self.size + 1, index % self.size + 1
+
+    def square_to_bit(self, row, column):
+        """
+        Returns the single-bit mask for a (row, column) board position.
+        """
+        return 1 << ((row - 1) * self.size + (column - 1))
+
+    def legal_moves(self, own, opp):
+        """
+        The version of legal_moves() for this board size.
+        :param own: bitboard of the moving color
+        :param opp: bitboard of the opponent's color
+        :return: bitboard of legal moves
+        """
+        empty = ~(own | opp) & self.full_mask
+        moves = 0
+        for amount, mask in self.left_shifts:
+            inner = opp & mask
+            run = (own << amount) & inner
+            for _ in range(self.size - 3):     # a line holds at most size - 2 opponent pieces
+                run |= (run << amount) & inner
+            moves |= (run << amount) & mask
+        for amount, mask in self.right_shifts:
+            inner = opp & mask
+            run = (own >> amount) & inner
+            for _ in range(self.size - 3):
+                run |= (run >> amount) & inner
+            moves |= (run >> amount) & mask
+        return moves & empty
+
+    def flips(self, own, opp, move):
+        """
+        The version of flips() for this board size, walking the rays from the destination.
+        :param own: bitboard of the moving color
+        :param opp: bitboard of the opponent's color
+        :param move: single-bit mask of the destination square
+        :return: bitboard of the pieces that change color
+        """
+        flipped = 0
+        for ray in self.rays[move.bit_length() - 1]:
+            line = 0
+            for square in ray:
+                if opp & square:
+                    line |= square
+                else:
+                    if own & square:
+                        flipped |= line
+                    break
+        return flipped
+
+    def neighbours(self, board):
+        """
+        The version of neighbours() for this board size.
+        :param board: any bitboard
+        :return: bitboard of the adjacent squares
+        """
+        adjacent = 0
+        for amount, mask in self.left_shifts:
+            adjacent |= (board << amount) & mask
+        for amount, mask in self.right_shifts:
+            adjacent |= (board >> amount) & mask
+        return adjacent & self.full_mask
+
+
+_GEOMETRIES = {}
+
+
+def get_geometry(size):
+    """
+    Returns the BoardGeometry for a board size, building its tables the first time.
+    :param size: number of rows (and columns) on the board
+    :return: BoardGeometry
+    """
+    geometry = _GEOMETRIES.get(size)
+    if geometry is None:
+        geometry = _GEOMETRIES[size] = BoardGeometry(size)
+    return geometry
@@ -0,0 +1,274 @@
+# Description: Opening book built from recorded games. Every position is stored under one
+#           canonical orientation of the board (the smallest of its 8 rotations and reflections),
+#           so mirror images and rotations share a single entry, and positions reached by different
+#           move orders share one entry too. For each position the book keeps, per move, how many
+#           games played it and how many of those the mover won or drew.
+#           The book file is a header followed by fixed-size entries sorted by position, so
+#           OpeningBook looks positions up with a binary search over a memory map instead of
+#           loading the file.
+#           Build from the command line, e.g.: python book.py games.rec --output book.bin --plies 20
+#
+#           File layout:
+#               header:     b'OTHB', version (1 byte), 3 reserved bytes, entry count (4 bytes,
+#                           little-endian)
+#               each entry: black bitboard (8 bytes), white bitboard (8), move byte (1), games (4),
+#                           wins (4), draws (4), all big-endian so entries sort as raw bytes
+#           The move byte is encoded as in records.py: the square index with records.COLOR_BIT
+#           set when white is to move.
+
+import argparse
+import mmap
+import struct
+
+import bitboard
+import records
+
+MAGIC = b'OTHB'
+VERSION = 1
+HEADER = struct.Struct('<4sB3xI')
+ENTRY = struct.Struct('>QQBIII')
+POSITION = struct.Struct('>QQ')
+KEY_SIZE = POSITION.size + 1    # the sort key is the position plus the move byte
+
+# plies stored by default when building a book
+BOOK_PLIES = 20
+
+
+def flip_vertical(board):
+    """
+    Reflects a bitboard top to bottom (row r becomes row 9 - r).
+    """
+    return int.from_bytes(board.to_bytes(8, 'little'), 'big')
+
+
+def mirror_horizontal(board):
+    """
+    Reflects a bitboard left to right (column c becomes column 9 - c).
+    """
+    board = ((board >> 1) & 0x5555555555555555) | ((board & 0x5555555555555555) << 1)
+    board = ((board >> 2) & 0x3333333333333333) | ((board & 0x3333333333333333) << 2)
+    board = ((board >> 4) & 0x0F0F0F0F0F0F0F0F) | ((board & 0x0F0F0F0F0F0F0F0F) << 4)
+    return board
+
+
+def transpose(board):
+    """
+    Reflects a bitboard in the main diagonal (square (r, c) becomes (c, r)).
+    """
+    swap = 0x0F0F0F0F00000000 & (board ^ (board << 28))
+    board ^= swap ^ (swap >> 28)
+    swap = 0x3333000033330000 & (board ^ (board << 14))
+    board ^= swap ^ (swap >> 14)
+    swap = 0x5500550055005500 & (board ^ (board << 7))
+    board ^= swap ^ (swap >> 7)
+    return board
+
+
+def transform(board, symmetry):
+    """
+    Applies one of the 8 symmetries of the board. Bit 0 of `symmetry` flips vertically, bit 1
+    mirrors horizontally and bit 2 transposes, in that order; 0 is the identity.
+    :param board: bitboard
+    :param symmetry: 0 to 7
+    :return: transformed bitboard
+    """
+    if symmetry & 1:
+        board = flip_vertical(board)
+    if symmetry & 2:
+        board = mirror_horizontal(board)
+    if symmetry & 4:
+        board = transpose(board)
+    return board
+
+
+def canonical(black, white):
+    """
+    Finds the canonical orientation of a position: the symmetry giving the smallest
+    (black, white) pair. Symmetric positions can have more than one such symmetry.
+    :param black: bitboard of the black pieces
+    :param white: bitboard of the white pieces
+    :return: ((black, white) in canonical orientation, list of symmetries that produce it)
+    """
+    best = None
+    symmetries = []
+    for symmetry in range(8):
+        key = (transform(black, symmetry), transform(white, symmetry))
+        if best is None or key < best:
+            best = key
+            symmetries = [symmetry]
+        elif key == best:
+            symmetries.append(symmetry)
+    return best, symmetries
+
+
+def canonical_move(index, symmetries):
+    """
+    Moves a square into canonical orientation. When a position is symmetric, moves that are
+    mirror images of each other map to the same square, so they share statistics.
+    :param index: square index in the original orientation
+    :param symmetries: symmetries from canonical()
+    :return: square index in canonical orientation
+    """
+    return min(transform(1 << index, symmetry).bit_length() - 1 for symmetry in symmetries)
+
+
+def _entry_key(black, white, color, index):
+    """
+    Packs the sort key of a book entry.
+    """
+    return POSITION.pack(black, white) + bytes([records.encode_move(color, bitboard.index_to_square(index))])
+
+
+def build_book(games, path, plies=BOOK_PLIES):
+    """
+    Builds a book file from recorded games. Unfinished games are skipped, and a game stops
+    counting at its first pass.
+    :param games: iterable of records.GameRecord objects, e.g. records.read_games(path)
+    :param path: book file to write
+    :param plies: number of moves from the start of each game to add to the book
+    :return: number of entries written
+    """
+    stats = {}  # entry key -> [games, wins, draws]
+    for record in games:
+        if record.result == records.UNFINISHED:
+            continue
+        boards = {'black': bitboard.square_to_bit(4, 5) | bitboard.square_to_bit(5, 4),
+                  'white': bitboard.square_to_bit(4, 4) | bitboard.square_to_bit(5, 5)}
+        for color, position in list(record.iter_moves())[:plies]:
+            if position is None:
+                break
+            opponent = 'white' if color == 'black' else 'black'
+            (black, white), symmetries = canonical(boards['black'], boards['white'])
+            index = bitboard.square_to_index(*position)
+            counts = stats.setdefault(_entry_key(black, white, color, canonical_move(index, symmetries)),
+                                      [0, 0, 0])
+            counts[0] += 1
+            if record.result == records.TIE:
+                counts[2] += 1
+            elif record.result == (records.BLACK_WIN if color == 'black' else records.WHITE_WIN):
+                counts[1] += 1
+
+            move = 1 << index
+            flipped = bitboard.flips(boards[color], boards[opponent], move)
+            boards[color] |= move | flipped
+            boards[opponent] ^= flipped
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(stats)))
+        for key in sorted(stats):
+            file.write(key + struct.pack('>III', *stats[key]))
+    return len(stats)
+
+
+class OpeningBook:
+    """
+    This class looks up moves in a book file through a memory map. A lookup is a binary search
+    over the sorted entries, so only a few entries are read per position. Can be used as a
+    context manager.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < HEADER.size:
+            raise ValueError('not an opening book file (too short)')
+        magic, version, self._count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError('not an opening book file (bad magic)')
+        if version != VERSION:
+            raise ValueError(f'unsupported opening book version {version}')
+        if len(self._map) < HEADER.size + self._count * ENTRY.size:
+            raise ValueError('opening book file is truncated')
+
+    def __len__(self):
+        return self._count
+
+    def _key_at(self, number):
+        offset = HEADER.size + number * ENTRY.size
+        return self._map[offset:offset + KEY_SIZE]
+
+    def return_move_stats(self, black, white, color):
+        """
+        Looks up the book moves for a position.
+        :param black: bitboard of the black pieces
+        :param white: bitboard of the white pieces
+        :param color: color to move
+        :return: dict of square index (in the position's own orientation) -> (games, wins, draws)
+                 for the mover; empty if the position isn't in the book
+        """
+        (canonical_black, canonical_white), symmetries = canonical(black, white)
+        start = _entry_key(canonical_black, canonical_white, color, 0)
+        stop = _entry_key(canonical_black, canonical_white, color, 63)
+
+        low, high = 0, self._count     # find the first entry not below `start`
+        while low < high:
+            middle = (low + high) // 2
+            if self._key_at(middle) < start:
+                low = middle + 1
+            else:
+                high = middle
+
+        found = {}
+        for number in range(low, self._count):
+            offset = HEADER.size + number * ENTRY.size
+            _, _, move_byte, games, wins, draws = ENTRY.unpack_from(self._map, offset)
+            if self._map[offset:offset + KEY_SIZE] > stop:
+                break
+            found[move_byte & ~records.COLOR_BIT] = (games, wins, draws)
+        if not found:
+            return {}
+
+        # map each legal move into canonical orientation to find its entry
+        stats = {}
+        own, opp = (black, white) if color == 'black' else (white, black)
+        for index in bitboard.iter_indexes(bitboard.legal_moves(own, opp)):
+            counts = found.get(canonical_move(index, symmetries))
+            if counts is not None:
+                stats[index] = counts
+        return stats
+
+    def return_book_moves(self, black, white, color):
+        """
+        Lists the book moves for a position with their win rates, best first. A draw counts as
+        half a win.
+        :param black: bitboard of the black pieces
+        :param white: bitboard of the white pieces
+        :param color: color to move
+        :return: list of ((row, column) position, games, win rate from 0.0 to 1.0)
+        """
+        moves = [(bitboard.index_to_square(index), games, (wins + draws / 2) / games)
+                 for index, (games, wins, draws) in self.return_move_stats(black, white, color).items()]
+        moves.sort(key=lambda move: (-move[2], -move[1], move[0]))
+        return moves
+
+    def close(self):
+        """
+        Closes the memory map and the file.
+        :return: None
+        """
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build an Othello opening book from game record files.')
+    parser.add_argument('record_files', nargs='+', help='game record files written by records.py')
+    parser.add_argument('--output', required=True, help='book file to write')
+    parser.add_argument('--plies', type=int, default=BOOK_PLIES,
+                        help=f'moves from the start of each game to add (default {BOOK_PLIES})')
+    args = parser.parse_args(argv)
+
+    def all_games():
+        for path in args.record_files:
+            yield from records.read_games(path)
+
+    print(f'{build_book(all_games(), args.output, args.plies)} book entries written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
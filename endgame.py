@@ -0,0 +1,292 @@
+# Description: Exact endgame solver for Othello. EndgameSolver plays out every line from a
+#           position to the end of the game and returns the final disc differential under
+#           perfect play, along with the move that achieves it. A solve takes well under a second
+#           with 12 empty squares and a few seconds with 16, and each extra empty square roughly
+#           doubles the time, so it's best kept to 18 or fewer. It's normally used through
+#           Othello.solve_endgame().
+
+import bitboard
+
+# with more empties than this, moves are ordered fastest-first (fewest replies for the
+# opponent); with this many or fewer, the cheaper parity ordering is used
+FASTEST_FIRST_EMPTIES = 5
+# positions with at least this many empties have their bounds cached during a solve
+CACHE_EMPTIES = 6
+
+# the four 4x4 quadrants; a quadrant with an odd number of empties is best entered first,
+# since the side that moves first there usually also moves last there
+QUADRANTS = (0x000000000F0F0F0F, 0x00000000F0F0F0F0, 0x0F0F0F0F00000000, 0xF0F0F0F000000000)
+CORNERS = 0x8100000000000081
+
+
+def count_flips(own, opp, index):
+    """
+    Counts the pieces a move would take without building the flipped bitboard. Used on the
+    last empty square, where only the score matters.
+    :param own: bitboard of the moving color
+    :param opp: bitboard of the opponent's color
+    :param index: index of the (empty) destination square
+    :return: number of pieces taken
+    """
+    count = 0
+    for ray in bitboard.RAYS[index]:
+        run = 0
+        for square in ray:
+            if opp & square:
+                run += 1
+            else:
+                if own & square:
+                    count += run
+                break
+    return count
+
+
+def flips_at(own, opp, index):
+    """
+    Finds the pieces a move would take by walking the rays from its square, which is faster
+    than bitboard.flips() for the single moves the solver makes.
+    :param own: bitboard of the moving color
+    :param opp: bitboard of the opponent's color
+    :param index: index of the (empty) destination square
+    :return: bitboard of the pieces that change color
+    """
+    flipped = 0
+    for ray in bitboard.RAYS[index]:
+        line = 0
+        for square in ray:
+            if opp & square:
+                line |= square
+            else:
+                if own & square:
+                    flipped |= line
+                break
+    return flipped
+
+
+class EndgameSolver:
+    """
+    This class solves endgames exactly with principal variation search (alpha-beta with null
+    windows) on the disc differential.
+    Scores follow the same rules as Othello.play_game(): the game ends when neither side can
+    move, and the score is the difference in pieces (empty squares count for nobody).
+    Moves are ordered fastest-first while many empties remain and by quadrant parity near the
+    end. The last two empties are handled by dedicated routines, and the final move only counts
+    flips instead of making the move. Bounds and the best move for positions with many empties
+    are cached during a solve, since move orders often transpose into the same position and the
+    null-window searches visit positions more than once; the cached move is tried first.
+    """
+    def __init__(self):
+        self._nodes = 0
+        # (own, opp) -> (lower bound, upper bound, best move bit or 0), for the current solve only
+        self._bounds = {}
+
+    def solve(self, own, opp):
+        """
+        Solves a position exactly.
+        :param own: bitboard of the side to move
+        :param opp: bitboard of the other side
+        :return: (final disc differential for the side to move, index of the best move); the
+                 move is None if the side to move has no legal moves
+        """
+        self._nodes = 0
+        self._bounds = {}
+        empty = ~(own | opp) & bitboard.FULL_MASK
+        moves = bitboard.legal_moves(own, opp)
+        if not moves:
+            if not empty or not bitboard.legal_moves(opp, own):
+                return own.bit_count() - opp.bit_count(), None
+            return -self._solve(opp, own, -64, 64), None
+
+        alpha = -65
+        best_move = None
+        for move, flipped in self._order_moves(own, opp, moves, empty):
+            child_own, child_opp = opp ^ flipped, own | move | flipped
+            if best_move is None:
+                score = -self._solve(child_own, child_opp, -64, -alpha)
+            else:
+                # null window: only checks that the move is no better than the best so far
+                score = -self._solve(child_own, child_opp, -alpha - 1, -alpha)
+                if score > alpha:
+                    score = -self._solve(child_own, child_opp, -64, -score)
+            if score > alpha:
+                alpha = score
+                best_move = move.bit_length() - 1
+        return alpha, best_move
+
+    def get_nodes(self):
+        """
+        Returns how many positions the last solve() visited.
+        :return: node count
+        """
+        return self._nodes
+
+    def _solve(self, own, opp, alpha, beta):
+        """
+        Principal variation search to the end of the game: the first move is searched with the
+        full window and the others with a null window, searching again only if one turns out
+        better.
+        :param own: bitboard of the side to move
+        :param opp: bitboard of the other side
+        :param alpha: lower bound of the search window
+        :param beta: upper bound of the search window
+        :return: final disc differential for the side to move
+        """
+        self._nodes += 1
+        empty = ~(own | opp) & bitboard.FULL_MASK
+        empties = empty.bit_count()
+        if empties == 1:
+            return self._solve_last_one(own, opp, empty.bit_length() - 1)
+        if empties == 2:
+            return self._solve_last_two(own, opp, empty, alpha, beta)
+
+        cached = empties >= CACHE_EMPTIES
+        hint = 0
+        if cached:
+            entry = self._bounds.get((own, opp))
+            if entry is not None:
+                lower, upper, hint = entry
+                if lower >= beta:
+                    return lower
+                if upper <= alpha:
+                    return upper
+                if lower == upper:
+                    return lower
+                alpha = max(alpha, lower)
+                beta = min(beta, upper)
+        original_alpha = alpha
+
+        if empties > FASTEST_FIRST_EMPTIES:
+            moves = bitboard.legal_moves(own, opp)
+        else:
+            moves = empty   # near the end, trying each empty square is cheaper than legal_moves()
+        best_score = -65
+        best_move = 0
+        for move, flipped in self._order_moves(own, opp, moves, empty, hint):
+            child_own, child_opp = opp ^ flipped, own | move | flipped
+            if not best_move:
+                score = -self._solve(child_own, child_opp, -beta, -alpha)
+            else:
+                score = -self._solve(child_own, child_opp, -alpha - 1, -alpha)
+                if alpha < score < beta:
+                    score = -self._solve(child_own, child_opp, -beta, -score)
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if not best_move:
+            if not bitboard.legal_moves(opp, own):  # neither side can move, the game is over
+                return own.bit_count() - opp.bit_count()
+            return -self._solve(opp, own, -beta, -alpha)
+        if cached:
+            lower, upper, _ = self._bounds.get((own, opp), (-64, 64, 0))
+            if best_score <= original_alpha:
+                upper = min(upper, best_score)  # failed low: only an upper bound
+            elif best_score >= beta:
+                lower = max(lower, best_score)  # failed high: only a lower bound
+            else:
+                lower = upper = best_score
+            self._bounds[(own, opp)] = (lower, upper, best_move)
+        return best_score
+
+    def _order_moves(self, own, opp, moves, empty, hint=0):
+        """
+        Orders the legal moves and works out their flips, one move at a time so no work is
+        spent on the moves after a cutoff.
+        The cached best move from an earlier visit to the position (`hint`) comes first. After
+        it, with many empties, moves that leave the opponent the fewest replies come first (ties
+        go to corners). Near the end, moves into quadrants with an odd number of empties come
+        first, and `moves` may include empty squares that aren't legal moves; they're skipped.
+        :return: generator of (move bit, flipped bitboard) pairs, best first
+        """
+        if hint & moves:
+            moves &= ~hint
+            yield hint, flips_at(own, opp, hint.bit_length() - 1)
+
+        odd = 0
+        for quadrant in QUADRANTS:
+            if (empty & quadrant).bit_count() & 1:
+                odd |= quadrant
+
+        if empty.bit_count() > FASTEST_FIRST_EMPTIES:
+            scored = []
+            for index in bitboard.iter_indexes(moves):
+                move = 1 << index
+                flipped = flips_at(own, opp, index)
+                replies = bitboard.legal_moves(opp ^ flipped, own | move | flipped).bit_count()
+                scored.append((replies * 4 - (2 if move & CORNERS else 0) - (1 if move & odd else 0),
+                               move, flipped))
+            scored.sort()
+            for _, move, flipped in scored:
+                yield move, flipped
+            return
+
+        for part in (moves & odd, moves & ~odd):
+            for index in bitboard.iter_indexes(part):
+                move = 1 << index
+                flipped = flips_at(own, opp, index)
+                if flipped:
+                    yield move, flipped
+
+    def _solve_last_two(self, own, opp, empty, alpha, beta):
+        """
+        Solves a position with exactly two empty squares.
+        :param own: bitboard of the side to move
+        :param opp: bitboard of the other side
+        :param empty: bitboard of the two empty squares
+        :param alpha: lower bound of the search window
+        :param beta: upper bound of the search window
+        :return: final disc differential for the side to move
+        """
+        first = (empty & -empty).bit_length() - 1
+        second = empty.bit_length() - 1
+
+        best_score = -65
+        for index, last in ((first, second), (second, first)):
+            move = 1 << index
+            flipped = flips_at(own, opp, index)
+            if flipped:
+                self._nodes += 1
+                score = -self._solve_last_one(opp ^ flipped, own | move | flipped, last)
+                if score > best_score:
+                    best_score = score
+                    if score >= beta:
+                        return score
+        if best_score > -65:
+            return best_score
+
+        # the side to move has to pass, so the opponent picks the lowest score
+        best_score = 65
+        for index, last in ((first, second), (second, first)):
+            move = 1 << index
+            flipped = flips_at(opp, own, index)
+            if flipped:
+                self._nodes += 1
+                score = self._solve_last_one(own ^ flipped, opp | move | flipped, last)
+                if score < best_score:
+                    best_score = score
+                    if score <= alpha:
+                        return score
+        if best_score < 65:
+            return best_score
+        return own.bit_count() - opp.bit_count()
+
+    def _solve_last_one(self, own, opp, index):
+        """
+        Scores a position with exactly one empty square, using flip counts only.
+        :param own: bitboard of the side to move
+        :param opp: bitboard of the other side
+        :param index: index of the empty square
+        :return: final disc differential for the side to move
+        """
+        self._nodes += 1
+        score = own.bit_count() - opp.bit_count()
+        taken = count_flips(own, opp, index)
+        if taken:
+            return score + 2 * taken + 1
+        taken = count_flips(opp, own, index)
+        if taken:
+            return score - 2 * taken - 1
+        return score    # neither side can move, the last square stays empty
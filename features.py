@@ -0,0 +1,272 @@
+# Description: Bulk position features for training evaluation functions. Positions come from
+#           game record files (see records.py) or from a stream of Othello objects, and their
+#           features come out as NumPy arrays a chunk at a time, so a dataset never has to fit
+#           in memory. The games of a chunk are replayed side by side with the BatchOthello array
+#           functions, and each game's stable discs are carried from one position to the next.
+#           Requires NumPy.
+#           Run from the command line, e.g.: python features.py games.rec --output features
+#           which writes features_00000.npz, features_00001.npz, ... one file per chunk.
+#
+#           Every chunk is a dict of arrays with one row per position; arrays with a color axis
+#           hold black in column 0 and white in column 1 (batch.BLACK and batch.WHITE):
+#               planes      uint8 (N, 2, 8, 8)  each color's pieces, planes[n, c, row - 1, column - 1]
+#               to_move     int8 (N,)           color to move
+#               mobility    int8 (N, 2)         valid moves for each color
+#               frontier    int8 (N, 2)         discs touching an empty square
+#               stable      int8 (N, 2)         discs that can never be taken (see stable_discs())
+#               corners     int8 (N, 2)         discs on the corners
+#               x_squares   int8 (N, 2)         discs diagonally next to a corner
+#               c_squares   int8 (N, 2)         discs on an edge next to a corner
+#               empties     int8 (N,)           empty squares
+#               parity      int8 (N,)           1 if the number of empty squares is odd
+#           Positions from game records also have:
+#               game        int64 (N,)          game number in the record stream
+#               ply         int16 (N,)          moves (passes included) made before the position
+#               final_disc_diff int8 (N,)       black pieces minus white pieces at the end of the game
+
+import argparse
+
+import numpy as np
+
+import batch
+import bitboard
+import records
+
+# (left shift, right shift) pairs for the four lines through a square: horizontal,
+# vertical and the two diagonals (bitboard.LEFT_SHIFTS and RIGHT_SHIFTS are listed in
+# opposite-direction order)
+_AXES = tuple(((np.uint64(left), np.uint64(left_mask)), (np.uint64(right), np.uint64(right_mask)))
+              for (left, left_mask), (right, right_mask) in zip(bitboard.LEFT_SHIFTS, bitboard.RIGHT_SHIFTS))
+# squares with no neighbour on the lower-bit side, and on the higher-bit side, of each line
+_EDGES = tuple((np.uint64(~((bitboard.FULL_MASK << left) & left_mask) & bitboard.FULL_MASK),
+                np.uint64(~((bitboard.FULL_MASK >> right) & right_mask) & bitboard.FULL_MASK))
+               for (left, left_mask), (right, right_mask) in zip(bitboard.LEFT_SHIFTS, bitboard.RIGHT_SHIFTS))
+
+CORNER_INDEXES = [0, 7, 56, 63]
+X_SQUARE_INDEXES = [9, 14, 49, 54]
+C_SQUARE_INDEXES = [1, 8, 6, 15, 48, 57, 55, 62]
+
+START_BLACK = bitboard.square_to_bit(4, 5) | bitboard.square_to_bit(5, 4)
+START_WHITE = bitboard.square_to_bit(4, 4) | bitboard.square_to_bit(5, 5)
+
+
+def full_lines(occupied):
+    """
+    Finds, for each of the four lines through a square, the squares whose whole line is filled.
+    :param occupied: uint64 array of occupied squares
+    :return: tuple of four uint64 arrays (horizontal, vertical, and the two diagonals)
+    """
+    full = []
+    empty = ~occupied
+    for (left, left_mask), (right, right_mask) in _AXES:
+        # spread the empty squares along the line; whatever they don't reach is full
+        reached = empty
+        for _ in range(7):
+            reached = reached | ((reached << left) & left_mask) | ((reached >> right) & right_mask)
+        full.append(~reached)
+    return tuple(full)
+
+
+def stable_discs(own, opp, seed=None):
+    """
+    Finds discs of one color that can never be taken. A disc is stable when, along each of
+    the four lines through it, the line is full, or the disc is on the edge, or its neighbour
+    on that line is a stable disc of the same color. This is worked out by growing the stable
+    set until nothing more is added, so it finds most, but not always all, stable discs.
+    :param own: uint64 array of the color's bitboards
+    :param opp: uint64 array of the other color's bitboards
+    :param seed: optional uint64 array of discs already known to be stable, e.g. this color's
+                 stable discs from an earlier position of the same game; it only saves work
+    :return: uint64 array of stable discs
+    """
+    lines = full_lines(own | opp)
+    stable = np.zeros_like(own) if seed is None else seed & own
+    while True:
+        grown = own.copy()
+        for full, ((left, left_mask), (right, right_mask)), (low_edge, high_edge) in zip(lines, _AXES, _EDGES):
+            grown &= full | low_edge | high_edge | ((stable << left) & left_mask) | ((stable >> right) & right_mask)
+        if np.array_equal(grown, stable):
+            return stable
+        stable = grown
+
+
+def position_features(black, white, to_move, stable=None):
+    """
+    Works out the features of a batch of positions (see the top of this file).
+    :param black: uint64 array of black bitboards
+    :param white: uint64 array of white bitboards
+    :param to_move: int array of the color to move (batch.BLACK or batch.WHITE)
+    :param stable: optional (black, white) uint64 arrays of discs already known to be stable
+    :return: (dict of feature arrays, (black, white) stable-disc bitboards)
+    """
+    black = np.asarray(black, dtype=np.uint64)
+    white = np.asarray(white, dtype=np.uint64)
+    count = len(black)
+    black_planes = batch.bit_planes(black)
+    white_planes = batch.bit_planes(white)
+    empty = ~(black | white)
+    near_empty = batch.neighbours(empty)
+    stable_black = stable_discs(black, white, None if stable is None else stable[0])
+    stable_white = stable_discs(white, black, None if stable is None else stable[1])
+    empties = 64 - black_planes.sum(axis=1, dtype=np.int64) - white_planes.sum(axis=1, dtype=np.int64)
+
+    def both(black_counts, white_counts):
+        return np.stack([black_counts, white_counts], axis=1).astype(np.int8)
+
+    features = {
+        'planes': np.stack([black_planes, white_planes], axis=1).reshape(count, 2, 8, 8),
+        'to_move': np.asarray(to_move, dtype=np.int8),
+        'mobility': both(batch.popcount(batch.legal_moves(black, white)),
+                         batch.popcount(batch.legal_moves(white, black))),
+        'frontier': both(batch.popcount(black & near_empty), batch.popcount(white & near_empty)),
+        'stable': both(batch.popcount(stable_black), batch.popcount(stable_white)),
+        'corners': both(black_planes[:, CORNER_INDEXES].sum(axis=1), white_planes[:, CORNER_INDEXES].sum(axis=1)),
+        'x_squares': both(black_planes[:, X_SQUARE_INDEXES].sum(axis=1),
+                          white_planes[:, X_SQUARE_INDEXES].sum(axis=1)),
+        'c_squares': both(black_planes[:, C_SQUARE_INDEXES].sum(axis=1),
+                          white_planes[:, C_SQUARE_INDEXES].sum(axis=1)),
+        'empties': empties.astype(np.int8),
+        'parity': (empties & 1).astype(np.int8)
+    }
+    return features, (stable_black, stable_white)
+
+
+def record_features(chunk, first_game=0):
+    """
+    Works out the features of every position in a list of recorded games: the position before
+    each move, passes included. The games are replayed side by side, and each game's stable
+    discs are passed on to its next position.
+    :param chunk: list of records.GameRecord objects
+    :param first_game: game number of the first record
+    :return: dict of feature arrays, rows ordered by game and then ply
+    """
+    count = len(chunk)
+    lengths = np.array([len(record.moves) for record in chunk], dtype=np.int64)
+    # at least one ply, so a chunk of games without moves still gives (empty) arrays
+    moves = np.zeros((count, max(max(lengths, default=0), 1)), dtype=np.uint8)
+    for number, record in enumerate(chunk):
+        moves[number, :len(record.moves)] = np.frombuffer(record.moves, dtype=np.uint8)
+    final_diff = np.array([record.black_pieces - record.white_pieces for record in chunk], dtype=np.int8)
+
+    boards = np.empty((2, count), dtype=np.uint64)
+    boards[batch.BLACK] = np.uint64(START_BLACK)
+    boards[batch.WHITE] = np.uint64(START_WHITE)
+    stable = (np.zeros(count, dtype=np.uint64), np.zeros(count, dtype=np.uint64))
+    games = np.arange(count)
+    parts = []
+    for ply in range(moves.shape[1]):
+        rows = np.flatnonzero(lengths > ply)     # games that haven't ended by this ply
+        move_bytes = moves[rows, ply]
+        to_move = (move_bytes >> 7).astype(np.int8)
+        features, found = position_features(boards[batch.BLACK, rows], boards[batch.WHITE, rows], to_move,
+                                            (stable[0][rows], stable[1][rows]))
+        stable[0][rows], stable[1][rows] = found
+        features['game'] = first_game + games[rows]
+        features['ply'] = np.full(len(rows), ply, dtype=np.int16)
+        features['final_disc_diff'] = final_diff[rows]
+        parts.append(features)
+
+        # make the moves; a pass (square records.PASS) changes nothing
+        square = (move_bytes & ~np.uint8(records.COLOR_BIT)).astype(np.uint64)
+        move = np.where(square < 64, np.uint64(1) << np.minimum(square, np.uint64(63)), np.uint64(0))
+        own = boards[to_move, rows]
+        opp = boards[1 - to_move, rows]
+        flipped = batch.flips(own, opp, move)
+        boards[to_move, rows] = own | move | flipped
+        boards[1 - to_move, rows] = opp ^ flipped
+
+    combined = {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    order = np.lexsort((combined['ply'], combined['game']))
+    return {name: values[order] for name, values in combined.items()}
+
+
+def iter_record_features(games, games_per_chunk=4096):
+    """
+    Streams the features of recorded games a chunk of games at a time.
+    :param games: iterable of records.GameRecord objects, e.g. records.read_games(path)
+    :param games_per_chunk: games per chunk (about 60 positions each)
+    :return: generator of dicts of feature arrays (see record_features())
+    """
+    chunk = []
+    first_game = 0
+    for record in games:
+        chunk.append(record)
+        if len(chunk) == games_per_chunk:
+            yield record_features(chunk, first_game)
+            first_game += len(chunk)
+            chunk = []
+    if chunk:
+        yield record_features(chunk, first_game)
+
+
+def color_to_move(game):
+    """
+    Works out which color moves next in an Othello game, which doesn't enforce turn order
+    itself. The color after the last move of the game's play_game() history moves next, or
+    with no history (games built with make_move()), the color whose turn it is by the number
+    of pieces on the board. If that color has no valid move and the other color has, the
+    other color moves instead. Passes can't be seen in the number of pieces, so games built
+    without play_game() should be given with their color to move.
+    :param game: Othello object
+    :return: 'black' or 'white'
+    """
+    history = game.return_history()
+    if history:
+        color = 'white' if history[-1][0] == 'black' else 'black'
+    else:
+        scores = game.return_scores()
+        color = 'black' if (scores['black'] + scores['white']) % 2 == 0 else 'white'
+    other = 'white' if color == 'black' else 'black'
+    if not game.return_available_positions(color) and game.return_available_positions(other):
+        return other
+    return color
+
+
+def iter_game_features(games, chunk_size=65536):
+    """
+    Streams the features of Othello objects' current positions a chunk at a time. The pieces
+    are read as each object arrives, so the same object can be yielded again after more moves.
+    :param games: iterable of Othello objects, whose color to move is worked out by
+                  color_to_move(), or of (Othello object, color to move) pairs
+    :param chunk_size: positions per chunk
+    :return: generator of dicts of feature arrays (see position_features())
+    :raises ValueError: for a game that isn't on the 8x8 board
+    """
+    black, white, to_move = [], [], []
+    for game in games:
+        game, color = game if isinstance(game, tuple) else (game, None)
+        if game.return_size() != 8:
+            raise ValueError('position features only support the 8x8 board')
+        if color is None:
+            color = color_to_move(game)
+        bitboards = game.return_bitboards()
+        black.append(bitboards['black'])
+        white.append(bitboards['white'])
+        to_move.append(batch.BLACK if color == 'black' else batch.WHITE)
+        if len(black) == chunk_size:
+            yield position_features(np.array(black, dtype=np.uint64), np.array(white, dtype=np.uint64), to_move)[0]
+            black, white, to_move = [], [], []
+    if black:
+        yield position_features(np.array(black, dtype=np.uint64), np.array(white, dtype=np.uint64), to_move)[0]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract position features from game record files.')
+    parser.add_argument('record_files', nargs='+', help='game record files written by records.py')
+    parser.add_argument('--output', required=True, help='prefix of the .npz files to write')
+    parser.add_argument('--games-per-chunk', type=int, default=4096, help='games per output file (default 4096)')
+    args = parser.parse_args(argv)
+
+    def all_games():
+        for path in args.record_files:
+            yield from records.read_games(path)
+
+    positions = 0
+    for number, features in enumerate(iter_record_features(all_games(), args.games_per_chunk)):
+        np.savez(f'{args.output}_{number:05d}.npz', **features)
+        positions += len(features['to_move'])
+    print(f'{positions} positions written')
+
+
+if __name__ == '__main__':
+    main()
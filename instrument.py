@@ -0,0 +1,235 @@
+# Description: Opt-in instrumentation for Othello games. Instrumentation counts and times the
+#           rules methods of one Othello object, tracks the recursion depth of the recursive
+#           methods, and records flips per move, the branching factor (legal moves per position,
+#           whether they were listed by return_available_positions or worked out by play_game's
+#           checks) and duplicate entries in the available-positions lists. It works by putting
+#           timing wrappers in front of the methods on that one object while it's enabled, so a
+#           game that isn't instrumented runs exactly the same code as before. It's normally used
+#           through Othello.enable_instrumentation() and Othello.stats().
+
+import time
+
+# the Othello methods that are timed, in the order they're reported
+TIMED_METHODS = ('play_game', 'return_available_positions', 'rec_available_positions', '_is_legal_position',
+                 '_legal_position_set', 'make_move', 'apply_move', 'rec_make_move')
+# methods that call themselves; their recursion depth is tracked
+RECURSIVE_METHODS = ('rec_available_positions', 'rec_make_move')
+
+
+class Instrumentation:
+    """
+    This class instruments one Othello object. Every timed call records its total time and its
+    own time (the total minus the timed calls it made), so a slow play_game() can be split
+    into move generation, validation, flip application and end-of-game checks (the
+    _legal_position_set calls it makes after the move). Callbacks are called after every timed
+    call as callback(method name, elapsed nanoseconds, return value).
+    """
+    def __init__(self, game):
+        self._game = game
+        self._callbacks = []
+        self._installed = False
+        # method name -> [calls, total ns, own ns, max ns]; the wrappers hold on to these lists
+        self._timings = {name: [0, 0, 0, 0] for name in TIMED_METHODS}
+        # the state of the timed calls in progress, which reset() leaves alone
+        self._children = []     # time spent in timed calls, for each timed call in progress
+        self._depth = {name: 0 for name in RECURSIVE_METHODS}
+        self.reset()
+
+    def reset(self):
+        """
+        Clears everything recorded so far. The timings are cleared in place, since the
+        wrappers hold on to them.
+        :return: None
+        """
+        for timing in self._timings.values():
+            timing[:] = [0, 0, 0, 0]
+        self._max_depth = {name: 0 for name in RECURSIVE_METHODS}
+        self._outer_calls = {name: 0 for name in RECURSIVE_METHODS}
+        self._moves = 0
+        self._flips = 0
+        self._flip_counts = {}  # pieces taken -> number of moves
+        self._branching_positions = 0
+        self._branching_total = 0
+        self._branching_seen = {}   # color -> (black, white) bitboards of its last sampled position
+        self._branching_max = 0
+        self._duplicates = 0
+        self._invalid_moves = 0
+        self._games_ended = 0
+
+    def install(self):
+        """
+        Puts the timing wrappers in front of the game's methods.
+        :return: None
+        """
+        if self._installed:
+            return
+        for name in TIMED_METHODS:
+            setattr(self._game, name, self._wrap(name, getattr(self._game, name)))
+        self._installed = True
+
+    def rebind(self):
+        """
+        Puts the timing wrappers back in front of the game's methods after the game has been
+        copied with copy.deepcopy(). The copy's wrappers aren't copied with it (see
+        Othello.__getstate__()), since they'd call the original game's methods.
+        :return: None
+        """
+        if self._installed:
+            self._installed = False
+            self.install()
+
+    def uninstall(self):
+        """
+        Removes the timing wrappers, so the game's methods run uninstrumented again.
+        :return: None
+        """
+        if not self._installed:
+            return
+        for name in TIMED_METHODS:
+            delattr(self._game, name)
+        self._installed = False
+
+    def add_callback(self, callback):
+        """
+        Adds a function to call after every timed call.
+        :param callback: function taking (method name, elapsed nanoseconds, return value)
+        :return: None
+        """
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """
+        Removes a function added by add_callback().
+        :return: None
+        """
+        self._callbacks.remove(callback)
+
+    def _wrap(self, name, method):
+        """
+        Makes the timing wrapper for one method.
+        :param name: method name
+        :param method: the bound method
+        :return: wrapper function
+        """
+        timing = self._timings[name]
+        children = self._children
+        recursive = name in RECURSIVE_METHODS
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            if recursive:
+                depth = self._depth[name] + 1
+                self._depth[name] = depth
+                if depth == 1:
+                    self._outer_calls[name] += 1
+                if depth > self._max_depth[name]:
+                    self._max_depth[name] = depth
+            children.append(0)
+            start = clock()
+            try:
+                result = method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                own = elapsed - children.pop()
+                if children:
+                    children[-1] += elapsed
+                timing[0] += 1
+                timing[1] += elapsed
+                timing[2] += own
+                if elapsed > timing[3]:
+                    timing[3] = elapsed
+                if recursive:
+                    self._depth[name] -= 1
+            self._observe(name, args, kwargs, result)
+            for callback in self._callbacks:
+                callback(name, elapsed, result)
+            return result
+        return wrapper
+
+    def _observe(self, name, args, kwargs, result):
+        """
+        Records what a call's arguments and return value say about the game.
+        """
+        if name == 'return_available_positions':
+            book = args[1] if len(args) > 1 else kwargs.get('book')
+            if book is not None:
+                return  # book moves, not the legal moves
+            distinct = len(set(result))
+            self._duplicates += len(result) - distinct
+            self._sample_branching(args[0] if args else kwargs['color'], distinct)
+        elif name == '_legal_position_set':
+            self._sample_branching(args[0] if args else kwargs['color'], len(result))
+        elif name == 'apply_move':
+            taken = result.flipped.bit_count()
+            self._moves += 1
+            self._flips += taken
+            self._flip_counts[taken] = self._flip_counts.get(taken, 0) + 1
+        elif name == 'play_game':
+            if result == "Invalid move":
+                self._invalid_moves += 1
+            elif result is not None:
+                self._games_ended += 1
+
+    def _sample_branching(self, color, distinct):
+        """
+        Records the number of legal moves for a color in the current position, once per
+        position: the same position is usually looked at several times (play_game validates the
+        move, then checks both colors for the end of the game), and the bitboard engine's
+        return_available_positions() goes through _legal_position_set().
+        :param color: color whose legal moves were found
+        :param distinct: number of distinct legal moves
+        :return: None
+        """
+        bitboards = self._game._bitboards
+        position = (bitboards['black'], bitboards['white'])
+        if self._branching_seen.get(color) == position:
+            return
+        self._branching_seen[color] = position
+        self._branching_positions += 1
+        self._branching_total += distinct
+        if distinct > self._branching_max:
+            self._branching_max = distinct
+
+    def snapshot(self):
+        """
+        Returns everything recorded so far.
+        :return: dict with 'methods' (calls, total_ms, own_ms, mean_us, max_us per method),
+                 'recursion' (max_depth and mean_depth per recursive method), 'moves' (count,
+                 flips, mean_flips and flips_histogram of pieces taken per move), 'branching'
+                 (positions sampled, mean and max legal moves per position, and duplicates in
+                 the available-positions lists) and
+                 'play_game' (invalid_moves, games_ended)
+        """
+        methods = {}
+        for name, (calls, total, own, longest) in self._timings.items():
+            methods[name] = {
+                'calls': calls,
+                'total_ms': total / 1e6,
+                'own_ms': own / 1e6,
+                'mean_us': total / calls / 1e3 if calls else 0.0,
+                'max_us': longest / 1e3
+            }
+        recursion = {}
+        for name in RECURSIVE_METHODS:
+            outer = self._outer_calls[name]
+            recursion[name] = {
+                'max_depth': self._max_depth[name],
+                'mean_depth': self._timings[name][0] / outer if outer else 0.0
+            }
+        return {
+            'methods': methods,
+            'recursion': recursion,
+            'moves': {
+                'count': self._moves,
+                'flips': self._flips,
+                'mean_flips': self._flips / self._moves if self._moves else 0.0,
+                'flips_histogram': dict(sorted(self._flip_counts.items()))
+            },
+            'branching': {
+                'positions': self._branching_positions,
+                'mean': self._branching_total / self._branching_positions if self._branching_positions else 0.0,
+                'max': self._branching_max,
+                'duplicates': self._duplicates
+            },
+            'play_game': {'invalid_moves': self._invalid_moves, 'games_ended': self._games_ended}
+        }
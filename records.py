@@ -0,0 +1,302 @@
+# Description: Compact binary game records. A record file holds any number of games, each stored
+#           as a small fixed header followed by one byte per move, plus an index of where every
+#           game starts so game K can be read without parsing the games before it.
+#           GameRecordWriter streams games into a file, read_games() streams them back out, and
+#           GameRecordFile reads single games through a memory map.
+#
+#           File layout (all integers little-endian):
+#               file header:    b'OTHR', version (1 byte), 3 reserved bytes
+#               each game:      move count (2 bytes), black pieces (1), white pieces (1),
+#                               result (1), then one byte per move
+#               index:          start offset of every game (8 bytes each)
+#               trailer:        index offset (8 bytes), game count (4 bytes), b'OTHR'
+#           A move byte is the square index (row - 1) * 8 + (column - 1), or PASS, with the
+#           COLOR_BIT set when the move is white's. Recording the color with each move keeps
+#           games where a player moved out of turn, which Othello.play_game() allows.
+
+import mmap
+import struct
+
+import bitboard
+from Othello import Othello
+
+MAGIC = b'OTHR'
+VERSION = 1
+FILE_HEADER = struct.Struct('<4sB3x')
+GAME_HEADER = struct.Struct('<HBBB')
+TRAILER = struct.Struct('<QI4s')
+OFFSET = struct.Struct('<Q')
+
+PASS = 64
+COLOR_BIT = 128
+
+# result byte values
+BLACK_WIN = 0
+WHITE_WIN = 1
+TIE = 2
+UNFINISHED = 3
+
+
+def encode_move(color, position):
+    """
+    Encodes one move as a byte.
+    :param color: 'black' or 'white'
+    :param position: (row, column) position, or None for a pass
+    :return: int from 0 to 255
+    """
+    square = PASS if position is None else bitboard.square_to_index(position[0], position[1])
+    return square | COLOR_BIT if color == 'white' else square
+
+
+def decode_move(byte):
+    """
+    Decodes a move byte.
+    :param byte: int from 0 to 255
+    :return: (color, position) with position None for a pass
+    """
+    color = 'white' if byte & COLOR_BIT else 'black'
+    square = byte & ~COLOR_BIT
+    return color, None if square == PASS else bitboard.index_to_square(square)
+
+
+class GameRecord:
+    """
+    This class is one recorded game: the move bytes, the final piece counts and the result.
+    """
+    __slots__ = ('moves', 'black_pieces', 'white_pieces', 'result')
+
+    def __init__(self, moves, black_pieces, white_pieces, result):
+        self.moves = bytes(moves)
+        self.black_pieces = black_pieces
+        self.white_pieces = white_pieces
+        self.result = result
+
+    def iter_moves(self):
+        """
+        Decodes the moves one at a time.
+        :return: generator of (color, position) moves, position None for a pass
+        """
+        for byte in self.moves:
+            yield decode_move(byte)
+
+    def replay(self, engine='bitboard', black_name='black', white_name='white'):
+        """
+        Rebuilds the game by making every move with make_move(), without validating or printing.
+        The game's history is filled in with the recorded moves, passes included, as if they
+        had been played through play_game(), so the game can be recorded again.
+        :param engine: Othello engine to use
+        :param black_name: name for the black player
+        :param white_name: name for the white player
+        :return: Othello object in the final position of the game
+        """
+        game = Othello(engine, verbose=False)
+        game.create_player(black_name, 'black')
+        game.create_player(white_name, 'white')
+        for color, position in self.iter_moves():
+            if position is not None:
+                game.make_move(color, position)
+            game._history.append((color, position))
+        return game
+
+    def __repr__(self):
+        return (f'GameRecord(moves={len(self.moves)}, black_pieces={self.black_pieces}, '
+                f'white_pieces={self.white_pieces}, result={self.result})')
+
+
+def _pack_game(record):
+    """
+    Packs a GameRecord into its on-disk form.
+    :return: bytes
+    """
+    return GAME_HEADER.pack(len(record.moves), record.black_pieces, record.white_pieces, record.result) + record.moves
+
+
+def record_from_game(game):
+    """
+    Makes a GameRecord from an Othello game, using the moves made through play_game(). The
+    moves are replayed to check that they lead to the pieces on the board, which they don't
+    for moves made with make_move() directly.
+    :param game: Othello object
+    :return: GameRecord
+    :raises ValueError: for a game that isn't on the 8x8 board, or whose history doesn't
+                        match its board
+    """
+    if game.return_size() != 8:
+        raise ValueError('game records only support the 8x8 board')
+    scores = game.return_scores()
+    moves = [encode_move(color, position) for color, position in game.return_history()]
+    if GameRecord(moves, 0, 0, UNFINISHED).replay().return_bitboards() != game.return_bitboards():
+        raise ValueError("the game's play_game() history doesn't lead to the pieces on its board")
+    if game.return_available_positions('black') or game.return_available_positions('white'):
+        result = UNFINISHED
+    elif scores['black'] > scores['white']:
+        result = BLACK_WIN
+    elif scores['white'] > scores['black']:
+        result = WHITE_WIN
+    else:
+        result = TIE
+    return GameRecord(moves, scores['black'], scores['white'], result)
+
+
+class GameRecordWriter:
+    """
+    This class writes games to a record file as they are played. The index and trailer are
+    written by close(), so the file isn't readable until then. Can be used as a context manager.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self._offsets = []
+
+    def write_record(self, record):
+        """
+        Appends a GameRecord to the file.
+        :param record: GameRecord
+        :return: None
+        """
+        self._offsets.append(self._file.tell())
+        self._file.write(_pack_game(record))
+
+    def write_game(self, game):
+        """
+        Appends an Othello game (its play_game() moves and current scores) to the file.
+        :param game: Othello object
+        :return: None
+        :raises ValueError: if the game can't be recorded (see record_from_game())
+        """
+        self.write_record(record_from_game(game))
+
+    def close(self):
+        """
+        Writes the index and trailer and closes the file.
+        :return: None
+        """
+        if self._file.closed:
+            return
+        index_offset = self._file.tell()
+        self._file.write(b''.join(OFFSET.pack(offset) for offset in self._offsets))
+        self._file.write(TRAILER.pack(index_offset, len(self._offsets), MAGIC))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_trailer(data):
+    """
+    Checks the file header and trailer of a record file's contents.
+    :param data: bytes-like contents of the file
+    :return: (index offset, game count)
+    """
+    if len(data) < FILE_HEADER.size + TRAILER.size:
+        raise ValueError('not a game record file (too short)')
+    magic, version = FILE_HEADER.unpack_from(data, 0)
+    index_offset, count, end_magic = TRAILER.unpack_from(data, len(data) - TRAILER.size)
+    if magic != MAGIC or end_magic != MAGIC:
+        raise ValueError('not a game record file (bad magic)')
+    if version != VERSION:
+        raise ValueError(f'unsupported game record version {version}')
+    return index_offset, count
+
+
+def _unpack_game(data, offset):
+    """
+    Unpacks the game starting at an offset.
+    :return: (GameRecord, offset just past the game)
+    """
+    move_count, black_pieces, white_pieces, result = GAME_HEADER.unpack_from(data, offset)
+    start = offset + GAME_HEADER.size
+    return GameRecord(data[start:start + move_count], black_pieces, white_pieces, result), start + move_count
+
+
+def read_games(path, chunk_size=1 << 16):
+    """
+    Reads every game in a record file in order, a buffered chunk at a time, without using the
+    index or loading the whole file.
+    :param path: record file
+    :param chunk_size: bytes to read at a time
+    :return: generator of GameRecord objects
+    """
+    with open(path, 'rb') as file:
+        file.seek(0, 2)
+        size = file.tell()
+        file.seek(max(0, size - TRAILER.size))
+        tail = file.read()
+        file.seek(0)
+        head = file.read(FILE_HEADER.size)
+        index_offset, count = _read_trailer(head + b'\0' * max(0, TRAILER.size - len(tail)) + tail)
+
+        buffer = b''
+        start = 0       # offset in buffer of the next game
+        position = FILE_HEADER.size     # file offset of buffer[0]
+        for _ in range(count):
+            available = len(buffer) - start
+            while (available < GAME_HEADER.size or
+                   available < GAME_HEADER.size + buffer[start] + (buffer[start + 1] << 8)):
+                # only the unread bytes are kept when more are read in
+                chunk = file.read(min(chunk_size, index_offset - position - len(buffer)))
+                if not chunk:
+                    raise ValueError('game record file is truncated')
+                position += start
+                buffer = buffer[start:] + chunk
+                start = 0
+                available = len(buffer)
+            record, start = _unpack_game(buffer, start)
+            yield record
+
+
+class GameRecordFile:
+    """
+    This class gives random access to the games in a record file through a memory map. Only
+    the bytes of the games that are asked for are read. Can be used as a context manager.
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._index_offset, self._count = _read_trailer(self._map)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, number):
+        """
+        Reads game `number` (negative numbers count from the end).
+        :param number: game number
+        :return: GameRecord
+        """
+        if number < 0:
+            number += self._count
+        if not 0 <= number < self._count:
+            raise IndexError('game number out of range')
+        (offset,) = OFFSET.unpack_from(self._map, self._index_offset + number * OFFSET.size)
+        return _unpack_game(self._map, offset)[0]
+
+    def __iter__(self):
+        for number in range(self._count):
+            yield self[number]
+
+    def replay(self, number, engine='bitboard'):
+        """
+        Rebuilds game `number` as an Othello object (see GameRecord.replay()).
+        :param number: game number
+        :param engine: Othello engine to use
+        :return: Othello object in the final position of the game
+        """
+        return self[number].replay(engine)
+
+    def close(self):
+        """
+        Closes the memory map and the file.
+        :return: None
+        """
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
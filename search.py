@@ -0,0 +1,330 @@
+# Description: Move-suggestion engine for Othello. SearchEngine runs an iterative-deepening
+#           alpha-beta (negamax) search over bitboards (see bitboard.py). Positions are keyed by
+#           Zobrist hashes that are updated move by move, and searched positions are kept in a
+#           fixed-size transposition table so transpositions and earlier iterations are reused.
+#           It is normally used through Othello.best_move().
+
+import random
+import time
+
+import bitboard
+
+# squares are grouped by their classic positional weight; evaluate() counts pieces per group
+SQUARE_WEIGHTS = (100, -20, 10, 5, 5, 10, -20, 100,
+                  -20, -50, -2, -2, -2, -2, -50, -20,
+                  10, -2, 1, 1, 1, 1, -2, 10,
+                  5, -2, 1, 0, 0, 1, -2, 5,
+                  5, -2, 1, 0, 0, 1, -2, 5,
+                  10, -2, 1, 1, 1, 1, -2, 10,
+                  -20, -50, -2, -2, -2, -2, -50, -20,
+                  100, -20, 10, 5, 5, 10, -20, 100)
+WEIGHT_MASKS = tuple((weight, sum(1 << index for index in range(64) if SQUARE_WEIGHTS[index] == weight))
+                     for weight in sorted(set(SQUARE_WEIGHTS)) if weight)
+# move indexes from the best square to the worst, used to order moves with no better hint
+MOVE_ORDER = tuple(sorted(range(64), key=lambda index: -SQUARE_WEIGHTS[index]))
+
+MOBILITY_WEIGHT = 8
+DISC_SCORE = 10000      # final positions score the disc differential times this
+INFINITY = 64 * DISC_SCORE + 1
+# the clock is read every this many nodes (a power of two); at about 30,000 nodes a second
+# that's every 8 ms or so, which keeps searches close to their time budget
+CLOCK_CHECK_NODES = 256
+
+# transposition table entry flags
+EXACT = 0
+LOWER = 1   # the score is a lower bound (the search failed high)
+UPPER = 2   # the score is an upper bound (the search failed low)
+
+# Zobrist keys: one per square per color, plus one that marks white to move. They are fixed
+# so hashes stay the same between runs.
+_zobrist_random = random.Random(0x0DE110)
+ZOBRIST = {
+    'black': tuple(_zobrist_random.getrandbits(64) for _ in range(64)),
+    'white': tuple(_zobrist_random.getrandbits(64) for _ in range(64))
+}
+# a taken piece swaps colors, so its key change is the same whichever color takes it
+ZOBRIST_FLIP = tuple(black ^ white for black, white in zip(ZOBRIST['black'], ZOBRIST['white']))
+ZOBRIST_WHITE_TO_MOVE = _zobrist_random.getrandbits(64)
+
+
+class SearchTimeout(Exception):
+    """
+    Raised inside SearchEngine when the time budget runs out, to unwind the current iteration.
+    """
+
+
+def zobrist_hash(black, white, color):
+    """
+    Computes the Zobrist hash of a position from scratch. The search only does this once at the
+    root and then updates the hash with each move.
+    :param black: bitboard of the black pieces
+    :param white: bitboard of the white pieces
+    :param color: color to move, 'black' or 'white'
+    :return: 64-bit hash
+    """
+    key = ZOBRIST_WHITE_TO_MOVE if color == 'white' else 0
+    for index in bitboard.iter_indexes(black):
+        key ^= ZOBRIST['black'][index]
+    for index in bitboard.iter_indexes(white):
+        key ^= ZOBRIST['white'][index]
+    return key
+
+
+def evaluate(own, opp):
+    """
+    Heuristic score of a position for the side to move: positional square weights plus the
+    difference in mobility.
+    :param own: bitboard of the side to move
+    :param opp: bitboard of the other side
+    :return: score, positive when the side to move is ahead
+    """
+    score = 0
+    for weight, mask in WEIGHT_MASKS:
+        score += weight * ((own & mask).bit_count() - (opp & mask).bit_count())
+    mobility = bitboard.legal_moves(own, opp).bit_count() - bitboard.legal_moves(opp, own).bit_count()
+    return score + MOBILITY_WEIGHT * mobility
+
+
+class TranspositionTable:
+    """
+    This class is a fixed-size, hash-indexed table of search results. Each slot holds one entry
+    (key, depth, flag, score, move, generation). A new entry replaces the stored one when the
+    stored one is from an earlier search or was searched no deeper than the new one; otherwise
+    the deeper, current result is kept.
+    """
+    def __init__(self, size=1 << 18):
+        if size & (size - 1):
+            raise ValueError(f"transposition table size must be a power of two, not {size}")
+        self._slots = [None] * size
+        self._mask = size - 1
+        self._generation = 0
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+        self._replacements = 0
+
+    def new_search(self):
+        """
+        Starts a new generation so entries from earlier searches can be replaced freely.
+        :return: None
+        """
+        self._generation += 1
+
+    def probe(self, key):
+        """
+        Looks up a position.
+        :param key: Zobrist hash of the position
+        :return: the stored entry tuple, or None if the position isn't in the table
+        """
+        self._probes += 1
+        entry = self._slots[key & self._mask]
+        if entry is not None and entry[0] == key:
+            self._hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        """
+        Stores a search result, following the replacement policy in the class description.
+        :param key: Zobrist hash of the position
+        :param depth: remaining depth the position was searched to
+        :param flag: EXACT, LOWER or UPPER
+        :param score: score of the position for the side to move
+        :param move: index of the best move found, or -1 if there was none
+        :return: None
+        """
+        slot = key & self._mask
+        entry = self._slots[slot]
+        if entry is not None:
+            if entry[5] == self._generation and entry[1] > depth and entry[0] != key:
+                return
+            self._replacements += 1
+        self._slots[slot] = (key, depth, flag, score, move, self._generation)
+        self._stores += 1
+
+    def get_stats(self):
+        """
+        Returns the table's counters since it was created.
+        :return: dict of probes, hits, hit_rate, stores, replacements and size
+        """
+        return {
+            'size': len(self._slots),
+            'probes': self._probes,
+            'hits': self._hits,
+            'hit_rate': self._hits / self._probes if self._probes else 0.0,
+            'stores': self._stores,
+            'replacements': self._replacements
+        }
+
+
+class SearchEngine:
+    """
+    This class finds the best move in a position with iterative-deepening negamax alpha-beta.
+    Moves are ordered with the transposition table's best move first and then by square weight.
+    A search can be limited by depth, by time, or both; when time runs out the best move of the
+    deepest completed iteration is returned.
+    The engine keeps its transposition table between searches. Statistics about the last
+    search are returned by get_stats().
+    """
+    def __init__(self, tt_size=1 << 18):
+        self._table = TranspositionTable(tt_size)
+        self._nodes = 0
+        self._deadline = None
+        self._stats = {}
+
+    def search(self, black, white, color, depth=None, time_budget_ms=None):
+        """
+        Searches a position for the best move.
+        :param black: bitboard of the black pieces
+        :param white: bitboard of the white pieces
+        :param color: color to move, 'black' or 'white'
+        :param depth: deepest iteration to search; None searches until the board is full or the
+                      time budget runs out
+        :param time_budget_ms: time limit in milliseconds, or None for no limit
+        :return: (move index, score) for the side to move; the move is None if there are no
+                 legal moves
+        """
+        opponent = 'white' if color == 'black' else 'black'
+        own, opp = (black, white) if color == 'black' else (white, black)
+        key = zobrist_hash(black, white, color)
+        empties = 64 - (black | white).bit_count()
+        max_depth = empties if depth is None else min(depth, empties)
+        start = time.perf_counter()
+        self._deadline = start + time_budget_ms / 1000 if time_budget_ms is not None else None
+        self._nodes = 0
+        self._table.new_search()
+        table_before = self._table.get_stats()
+
+        moves = bitboard.legal_moves(own, opp)
+        best_move = None
+        best_score = 0
+        completed = 0
+        if moves:
+            best_move = next(index for index in MOVE_ORDER if moves >> index & 1)
+            for iteration in range(1, max(max_depth, 1) + 1):
+                try:
+                    best_move, best_score = self._search_root(own, opp, ZOBRIST[color], ZOBRIST[opponent],
+                                                              key, iteration, moves, best_move)
+                except SearchTimeout:
+                    break
+                completed = iteration
+
+        elapsed = time.perf_counter() - start
+        table_stats = self._table.get_stats()
+        probes = table_stats['probes'] - table_before['probes']
+        hits = table_stats['hits'] - table_before['hits']
+        self._stats = {
+            'depth': completed,
+            'score': best_score,
+            'nodes': self._nodes,
+            'elapsed_ms': elapsed * 1000,
+            'nodes_per_second': self._nodes / elapsed if elapsed else 0.0,
+            'tt_probes': probes,
+            'tt_hits': hits,
+            'tt_hit_rate': hits / probes if probes else 0.0,
+            'tt_stores': table_stats['stores'] - table_before['stores'],
+            'tt_replacements': table_stats['replacements'] - table_before['replacements']
+        }
+        return best_move, best_score
+
+    def get_stats(self):
+        """
+        Returns statistics about the last search: depth completed, score, nodes searched,
+        elapsed time, nodes per second and the transposition table's probes, hits, hit rate,
+        stores and replacements during that search.
+        :return: dict of statistics; empty before the first search
+        """
+        return dict(self._stats)
+
+    def _search_root(self, own, opp, own_keys, opp_keys, key, depth, moves, first_move):
+        """
+        Searches every root move to the given depth, starting with the previous iteration's best.
+        :return: (best move index, score)
+        """
+        alpha = -INFINITY
+        best_move = first_move
+        ordered = [first_move] + [index for index in MOVE_ORDER if moves >> index & 1 and index != first_move]
+        for index in ordered:
+            move = 1 << index
+            flipped = bitboard.flips(own, opp, move)
+            child_key = key ^ ZOBRIST_WHITE_TO_MOVE ^ own_keys[index]
+            for flipped_index in bitboard.iter_indexes(flipped):
+                child_key ^= ZOBRIST_FLIP[flipped_index]
+            score = -self._negamax(opp ^ flipped, own | move | flipped, opp_keys, own_keys, child_key,
+                                   depth - 1, -INFINITY, -alpha)
+            if score > alpha:
+                alpha = score
+                best_move = index
+        self._table.store(key, depth, EXACT, alpha, best_move)
+        return best_move, alpha
+
+    def _negamax(self, own, opp, own_keys, opp_keys, key, depth, alpha, beta):
+        """
+        Negamax alpha-beta search of a position.
+        :param own: bitboard of the side to move
+        :param opp: bitboard of the other side
+        :param own_keys: Zobrist square keys for the side to move's color
+        :param opp_keys: Zobrist square keys for the other color
+        :param key: Zobrist hash of the position
+        :param depth: remaining depth
+        :param alpha: lower bound of the search window
+        :param beta: upper bound of the search window
+        :return: score for the side to move
+        """
+        self._nodes += 1
+        if (self._deadline is not None and not self._nodes & (CLOCK_CHECK_NODES - 1) and
+                time.perf_counter() > self._deadline):
+            raise SearchTimeout
+
+        entry = self._table.probe(key)
+        hint = -1
+        if entry is not None:
+            hint = entry[4]
+            if entry[1] >= depth:
+                flag, score = entry[2], entry[3]
+                if flag == EXACT:
+                    return score
+                if flag == LOWER and score >= beta:
+                    return score
+                if flag == UPPER and score <= alpha:
+                    return score
+
+        moves = bitboard.legal_moves(own, opp)
+        if not moves:
+            if not bitboard.legal_moves(opp, own):  # neither side can move, the game is over
+                return (own.bit_count() - opp.bit_count()) * DISC_SCORE
+            return -self._negamax(opp, own, opp_keys, own_keys, key ^ ZOBRIST_WHITE_TO_MOVE, depth, -beta, -alpha)
+        if depth <= 0:
+            return evaluate(own, opp)
+
+        original_alpha = alpha
+        best_score = -INFINITY
+        best_move = -1
+        ordered = [index for index in MOVE_ORDER if moves >> index & 1]
+        if hint in ordered:
+            ordered.remove(hint)
+            ordered.insert(0, hint)
+        for index in ordered:
+            move = 1 << index
+            flipped = bitboard.flips(own, opp, move)
+            child_key = key ^ ZOBRIST_WHITE_TO_MOVE ^ own_keys[index]
+            for flipped_index in bitboard.iter_indexes(flipped):
+                child_key ^= ZOBRIST_FLIP[flipped_index]
+            score = -self._negamax(opp ^ flipped, own | move | flipped, opp_keys, own_keys, child_key,
+                                   depth - 1, -beta, -alpha)
+            if score > best_score:
+                best_score = score
+                best_move = index
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+
+        if best_score <= original_alpha:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self._table.store(key, depth, flag, best_score, best_move)
+        return best_score
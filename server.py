@@ -0,0 +1,492 @@
+# Description: Multi-session Othello server. Clients connect over TCP or a Unix socket and send
+#           one JSON request per line; every request gets one JSON response line. Each session
+#           keeps only a compact game state (two bitboards, the color to move and one byte per
+#           move), enforces turn order, passes automatically when a color has no valid move, and
+#           can have either color played by a bot. Sessions idle for longer than the idle timeout
+#           are evicted.
+#           Run from the command line, e.g.: python server.py --port 8765
+#
+#           Requests ("request" is optional and is echoed back in the response):
+#               {"op": "new", "black": "Leo", "white": "Helen", "bots": {"white": "greedy"}}
+#               {"op": "move", "session": 1, "color": "black", "position": [5, 6]}
+#               {"op": "state", "session": 1}
+#               {"op": "close", "session": 1}
+#               {"op": "stats"}
+#           Responses have "ok": true plus the data asked for, or "ok": false and an "error".
+
+import argparse
+import asyncio
+import collections
+import json
+import random
+import sys
+import time
+
+import bitboard
+import records
+from search import SearchEngine
+
+COLORS = ('black', 'white')
+# search bots run on the event loop, so each of their moves is limited by depth and time, and
+# so is the search time of all the bot moves made for one request; once that runs out, search
+# bots play greedy moves until the request is answered
+MAX_SEARCH_DEPTH = 6
+BOT_MOVE_TIME_MS = 50
+BOT_REQUEST_TIME_MS = 200
+# asyncio's default of 100 waiting connections is too few when many clients connect at once
+BACKLOG = 1024
+
+
+class GameState:
+    """
+    This class is the compact state of one game: a bitboard per color, the color to move, and
+    the moves so far as bytes in the records.py encoding (passes included), so the game can
+    also be written out as a game record. Unlike Othello, turn order is enforced.
+    """
+    __slots__ = ('black', 'white', 'to_move', 'moves', 'finished')
+
+    def __init__(self):
+        self.black = bitboard.square_to_bit(4, 5) | bitboard.square_to_bit(5, 4)
+        self.white = bitboard.square_to_bit(4, 4) | bitboard.square_to_bit(5, 5)
+        self.to_move = 'black'
+        self.moves = bytearray()
+        self.finished = False
+
+    def _boards(self, color):
+        """
+        :return: (bitboard of `color`, bitboard of the other color)
+        """
+        return (self.black, self.white) if color == 'black' else (self.white, self.black)
+
+    def return_legal_moves(self):
+        """
+        Returns the legal moves of the color to move.
+        :return: bitboard of legal moves (0 once the game is finished)
+        """
+        if self.finished:
+            return 0
+        return bitboard.legal_moves(*self._boards(self.to_move))
+
+    def return_available_positions(self):
+        """
+        Returns the valid positions for the color to move.
+        :return: list of (row, column) positions in row-major order
+        """
+        return [bitboard.index_to_square(index) for index in bitboard.iter_indexes(self.return_legal_moves())]
+
+    def play(self, color, position):
+        """
+        Plays a move, then hands the turn to the other color, or back to `color` if the other
+        color has to pass. The game is finished when neither color can move.
+        :param color: color making the move
+        :param position: (row, column) position
+        :return: number of pieces taken
+        :raises ValueError: if the game is over, it's not `color`'s turn, or the move isn't valid
+        """
+        if self.finished:
+            raise ValueError('the game is over')
+        if color != self.to_move:
+            raise ValueError(f"it is {self.to_move}'s turn")
+        row, column = position
+        if not (1 <= row <= 8 and 1 <= column <= 8):
+            raise ValueError(f'{position} is not on the board')
+        move = bitboard.square_to_bit(row, column)
+        own, opp = self._boards(color)
+        if not bitboard.legal_moves(own, opp) & move:
+            raise ValueError(f'{position} is not a valid move for {color}')
+
+        flipped = bitboard.flips(own, opp, move)
+        own |= move | flipped
+        opp ^= flipped
+        if color == 'black':
+            self.black, self.white = own, opp
+        else:
+            self.white, self.black = own, opp
+        self.moves.append(records.encode_move(color, position))
+
+        opponent = 'white' if color == 'black' else 'black'
+        if bitboard.legal_moves(opp, own):
+            self.to_move = opponent
+        elif bitboard.legal_moves(own, opp):
+            self.moves.append(records.encode_move(opponent, None))
+        else:
+            self.finished = True
+        return flipped.bit_count()
+
+    def return_board(self):
+        """
+        Returns the board as rows of text, 'X' for black, 'O' for white and '.' for empty, the
+        same marks as Othello.print_board().
+        :return: list of 8 strings of 8 characters
+        """
+        rows = []
+        for row in range(1, 9):
+            line = ''
+            for column in range(1, 9):
+                bit = bitboard.square_to_bit(row, column)
+                line += 'X' if self.black & bit else 'O' if self.white & bit else '.'
+            rows.append(line)
+        return rows
+
+    def return_scores(self):
+        """
+        :return: dict of 'black' and 'white' piece counts
+        """
+        return {'black': self.black.bit_count(), 'white': self.white.bit_count()}
+
+    def return_winner(self):
+        """
+        Returns the winner by piece count; only meaningful once the game is finished.
+        :return: 'black', 'white', or None for a tie
+        """
+        black, white = self.black.bit_count(), self.white.bit_count()
+        if black == white:
+            return None
+        return 'black' if black > white else 'white'
+
+
+class Session:
+    """
+    This class is one game hosted by the server: its state, the players' names, the bot policy
+    for each color ('' for a person) and when it was last used.
+    """
+    __slots__ = ('session_id', 'state', 'black_name', 'white_name', 'black_bot', 'white_bot', 'last_active')
+
+    def __init__(self, session_id, black_name, white_name, black_bot='', white_bot='', now=0.0):
+        self.session_id = session_id
+        self.state = GameState()
+        self.black_name = black_name
+        self.white_name = white_name
+        self.black_bot = black_bot
+        self.white_bot = white_bot
+        self.last_active = now
+
+    def return_bot(self, color):
+        """
+        :return: the bot policy playing `color`, or '' if a person plays it
+        """
+        return self.black_bot if color == 'black' else self.white_bot
+
+
+def session_memory(session):
+    """
+    Adds up the memory held by one session: the session and state objects, their move bytes,
+    bitboards and names. Strings shared with other sessions (colors, policy names) aren't
+    counted.
+    :param session: Session
+    :return: bytes
+    """
+    state = session.state
+    return (sys.getsizeof(session) + sys.getsizeof(session.session_id) + sys.getsizeof(session.last_active) +
+            sys.getsizeof(session.black_name) + sys.getsizeof(session.white_name) +
+            sys.getsizeof(state) + sys.getsizeof(state.black) + sys.getsizeof(state.white) +
+            sys.getsizeof(state.moves))
+
+
+def check_policy(name):
+    """
+    Checks a bot policy name: 'random', 'greedy' (takes the most pieces), or 'search' or
+    'search:<depth>' (SearchEngine to a depth of 1 to MAX_SEARCH_DEPTH, 2 by default, within
+    BOT_MOVE_TIME_MS).
+    :param name: policy name
+    :return: None
+    :raises ValueError: for an unknown policy
+    """
+    if not isinstance(name, str):
+        raise ValueError(f'bot policy must be a string, not {name!r}')
+    if name in ('random', 'greedy'):
+        return
+    if name == 'search' or name.startswith('search:'):
+        depth = name.partition(':')[2]
+        if not depth or (depth.isdigit() and 0 < int(depth) <= MAX_SEARCH_DEPTH):
+            return
+    raise ValueError(f"unknown bot policy {name!r}; use 'random', 'greedy' or 'search[:depth]' "
+                     f"with a depth of at most {MAX_SEARCH_DEPTH}")
+
+
+class GameServer:
+    """
+    This class hosts the sessions. handle_request() answers one request (a dict) and can be
+    used without any sockets; serve_tcp() and serve_unix() put it on the network.
+    Sessions are kept in least-recently-used order, so evicting idle sessions only looks at the
+    ones that will actually be evicted.
+    """
+    def __init__(self, idle_timeout=300.0, max_sessions=None, seed=None, clock=time.monotonic):
+        """
+        :param idle_timeout: seconds a session may go unused before it's evicted
+        :param max_sessions: limit on open sessions, or None for no limit
+        :param seed: seed for the random bot policy
+        :param clock: function returning the current time in seconds
+        """
+        self._idle_timeout = idle_timeout
+        self._max_sessions = max_sessions
+        self._clock = clock
+        self._rng = random.Random(seed)
+        self._sessions = collections.OrderedDict()     # session id -> Session, least recently used first
+        self._next_id = 1
+        self._search_engine = None     # created by the first search bot move
+        self._created = 0
+        self._finished = 0
+        self._evicted = 0
+        self._requests = 0
+
+    def handle_request(self, request):
+        """
+        Answers one request.
+        :param request: dict decoded from a request line
+        :return: response dict
+        """
+        self._requests += 1
+        try:
+            if not isinstance(request, dict):
+                raise ValueError('a request must be a JSON object')
+            op = request.get('op')
+            if op == 'new':
+                response = self._new_session(request)
+            elif op == 'move':
+                response = self._move(request)
+            elif op == 'state':
+                response = self._describe(self._get_session(request), [])
+            elif op == 'close':
+                session = self._get_session(request)
+                del self._sessions[session.session_id]
+                response = {'ok': True, 'session': session.session_id, 'closed': True}
+            elif op == 'stats':
+                response = self.return_stats()
+            else:
+                raise ValueError(f'unknown op {op!r}')
+        except (KeyError, TypeError, ValueError) as error:
+            response = {'ok': False, 'error': str(error.args[0]) if error.args else type(error).__name__}
+        if isinstance(request, dict) and 'request' in request:
+            response['request'] = request['request']
+        return response
+
+    def _get_session(self, request):
+        """
+        Finds the session a request is for and marks it as used.
+        :return: Session
+        """
+        session_id = request.get('session')
+        session = self._sessions.get(session_id) if isinstance(session_id, int) else None
+        if session is None:
+            raise ValueError(f'unknown session {session_id!r}')
+        session.last_active = self._clock()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _new_session(self, request):
+        if self._max_sessions is not None and len(self._sessions) >= self._max_sessions:
+            self.evict_idle()
+            if len(self._sessions) >= self._max_sessions:
+                raise ValueError('too many sessions')
+        bots = request.get('bots') or {}
+        if not isinstance(bots, dict):
+            raise ValueError('bots must be an object mapping colors to policies')
+        for color, policy in bots.items():
+            if color not in COLORS:
+                raise ValueError(f'unknown color {color!r}')
+            check_policy(policy)
+        session = Session(self._next_id, str(request.get('black', 'black')), str(request.get('white', 'white')),
+                          bots.get('black', ''), bots.get('white', ''), self._clock())
+        self._sessions[session.session_id] = session
+        self._next_id += 1
+        self._created += 1
+        return self._describe(session, self._play_bots(session))
+
+    def _move(self, request):
+        session = self._get_session(request)
+        color = request.get('color')
+        if color not in COLORS:
+            raise ValueError(f'unknown color {color!r}')
+        if session.return_bot(color):
+            raise ValueError(f'{color} is played by a bot')
+        position = request.get('position')
+        if not (isinstance(position, list) and len(position) == 2 and all(isinstance(x, int) for x in position)):
+            raise ValueError('position must be [row, column]')
+        position = tuple(position)
+        taken = session.state.play(color, position)
+        played = [{'color': color, 'position': list(position), 'taken': taken}]
+        if session.state.finished:
+            self._finished += 1
+        return self._describe(session, played + self._play_bots(session))
+
+    def _play_bots(self, session):
+        """
+        Lets bots move for as long as it's a bot's turn. Search bots share BOT_REQUEST_TIME_MS of
+        search time (see MAX_SEARCH_DEPTH), so a game between two bots doesn't hold up the other
+        sessions for long.
+        :return: list of the moves made, as in the "moves" of a response
+        """
+        state = session.state
+        played = []
+        deadline = time.perf_counter() + BOT_REQUEST_TIME_MS / 1000
+        while not state.finished and session.return_bot(state.to_move):
+            color = state.to_move
+            remaining_ms = (deadline - time.perf_counter()) * 1000
+            position = self._bot_position(state, session.return_bot(color), remaining_ms)
+            played.append({'color': color, 'position': list(position), 'taken': state.play(color, position)})
+            if state.finished:
+                self._finished += 1
+        return played
+
+    def _bot_position(self, state, policy, remaining_ms):
+        """
+        Picks a bot's move.
+        :param state: GameState with legal moves for the color to move
+        :param policy: policy name (see check_policy())
+        :param remaining_ms: search time left for this request; a search bot with none left
+                             plays a greedy move
+        :return: (row, column) position
+        """
+        positions = state.return_available_positions()
+        if policy == 'random':
+            return self._rng.choice(positions)
+        if policy == 'greedy' or remaining_ms <= 0:
+            own, opp = state._boards(state.to_move)
+            return max(positions, key=lambda position:
+                       bitboard.flips(own, opp, bitboard.square_to_bit(*position)).bit_count())
+        if self._search_engine is None:
+            self._search_engine = SearchEngine()
+        index, _ = self._search_engine.search(state.black, state.white, state.to_move,
+                                              int(policy.partition(':')[2] or 2),
+                                              min(BOT_MOVE_TIME_MS, remaining_ms))
+        return bitboard.index_to_square(index)
+
+    def _describe(self, session, played):
+        """
+        Builds the response describing a session after the given moves.
+        """
+        state = session.state
+        response = {
+            'ok': True,
+            'session': session.session_id,
+            'players': {'black': session.black_name, 'white': session.white_name},
+            'moves': played,
+            'board': state.return_board(),
+            'scores': state.return_scores(),
+            'finished': state.finished,
+            'to_move': None if state.finished else state.to_move,
+            'available': [list(position) for position in state.return_available_positions()],
+            'result': None
+        }
+        if state.finished:
+            response['result'] = {'winner': state.return_winner(), **state.return_scores()}
+        return response
+
+    def evict_idle(self, now=None):
+        """
+        Closes sessions that haven't been used for longer than the idle timeout.
+        :param now: current time; defaults to the server's clock
+        :return: number of sessions evicted
+        """
+        now = self._clock() if now is None else now
+        evicted = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_active <= self._idle_timeout:
+                break
+            del self._sessions[session.session_id]
+            evicted += 1
+        self._evicted += evicted
+        return evicted
+
+    def return_stats(self):
+        """
+        Returns counts of sessions and requests and the memory held by the open sessions
+        (see session_memory()).
+        :return: response dict
+        """
+        memory = sum(session_memory(session) for session in self._sessions.values())
+        return {
+            'ok': True,
+            'sessions': len(self._sessions),
+            'created': self._created,
+            'finished': self._finished,
+            'evicted': self._evicted,
+            'requests': self._requests,
+            'session_bytes': memory,
+            'bytes_per_session': memory / len(self._sessions) if self._sessions else 0.0
+        }
+
+    async def handle_connection(self, reader, writer):
+        """
+        Answers the request lines from one connection until it closes.
+        :param reader: asyncio.StreamReader
+        :param writer: asyncio.StreamWriter
+        :return: None
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    response = {'ok': False, 'error': 'request is not valid JSON'}
+                else:
+                    response = self.handle_request(request)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _evict_periodically(self):
+        while True:
+            await asyncio.sleep(max(self._idle_timeout / 4, 0.01))
+            self.evict_idle()
+
+    async def serve(self, server):
+        """
+        Runs an asyncio server along with idle-session eviction until cancelled.
+        :param server: asyncio.Server using self.handle_connection
+        :return: None
+        """
+        eviction = asyncio.create_task(self._evict_periodically())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            eviction.cancel()
+
+    async def serve_tcp(self, host='127.0.0.1', port=8765, backlog=BACKLOG):
+        """
+        Serves on a TCP port until cancelled.
+        :param backlog: connections allowed to wait to be accepted
+        :return: None
+        """
+        await self.serve(await asyncio.start_server(self.handle_connection, host, port, backlog=backlog))
+
+    async def serve_unix(self, path, backlog=BACKLOG):
+        """
+        Serves on a Unix socket until cancelled.
+        :param backlog: connections allowed to wait to be accepted
+        :return: None
+        """
+        await self.serve(await asyncio.start_unix_server(self.handle_connection, path, backlog=backlog))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Host Othello games over line-delimited JSON.')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP host (default 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765, help='TCP port (default 8765)')
+    parser.add_argument('--unix', help='serve on this Unix socket path instead of TCP')
+    parser.add_argument('--idle-timeout', type=float, default=300.0,
+                        help='seconds before an unused session is evicted (default 300)')
+    parser.add_argument('--max-sessions', type=int, default=None, help='limit on open sessions')
+    parser.add_argument('--seed', type=int, default=None, help='seed for the random bot policy')
+    args = parser.parse_args(argv)
+
+    server = GameServer(args.idle_timeout, args.max_sessions, args.seed)
+    try:
+        asyncio.run(server.serve_unix(args.unix) if args.unix else server.serve_tcp(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# Description: Tests for batch.py: random BatchOthello games are replayed move by move through
+#           Othello.play_game() with both engines, and every board, turn, pass and result must
+#           match the single-game rules.
+
+import unittest
+
+import numpy as np
+
+import bitboard
+from batch import BLACK, WHITE, BatchOthello
+from Othello import Othello
+
+COLORS = {BLACK: 'black', WHITE: 'white'}
+
+
+class TestBatchOthello(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        """
+        Plays 300 random games in lockstep, recording every game's moves and boards.
+        """
+        cls.count = 300
+        games = BatchOthello(cls.count)
+        rng = np.random.default_rng(0)
+        cls.moves = [[] for _ in range(cls.count)]    # per game: (color, index, black, white, to_move next)
+        while not games.return_finished().all():
+            active = ~games.return_finished()
+            to_move = games.return_to_move()
+            moves = games.random_moves(rng)
+            games.make_moves(moves)
+            black, white = games.return_boards()
+            next_to_move = games.return_to_move()
+            finished = games.return_finished()
+            for number in np.flatnonzero(active):
+                cls.moves[number].append((COLORS[int(to_move[number])], int(moves[number]), int(black[number]),
+                                          int(white[number]), None if finished[number] else
+                                          COLORS[int(next_to_move[number])]))
+        cls.scores = games.return_scores()
+        cls.winners = games.return_winners()
+
+    def replay(self, engine):
+        for number, moves in enumerate(self.moves):
+            game = Othello(engine, verbose=False)
+            game.create_player('Leo', 'black')
+            game.create_player('Helen', 'white')
+            for ply, (color, index, black, white, next_color) in enumerate(moves):
+                result = game.play_game(color, bitboard.index_to_square(index))
+                self.assertNotEqual(result, 'Invalid move', (engine, number, ply))
+                self.assertEqual(game.return_bitboards(), {'black': black, 'white': white})
+                if next_color is None:
+                    # the batch game ended here, so play_game must have ended it too
+                    self.assertIsNotNone(result, (engine, number, ply))
+                else:
+                    self.assertIsNone(result, (engine, number, ply))
+                    other = 'white' if color == 'black' else 'black'
+                    # the turn passes to the other color unless it has no valid move
+                    expected = other if game.return_available_positions(other) else color
+                    self.assertEqual(next_color, expected, (engine, number, ply))
+            scores = game.return_scores()
+            self.assertEqual((scores['black'], scores['white']),
+                             (int(self.scores[0][number]), int(self.scores[1][number])))
+            winner = int(self.winners[number])
+            if winner == -1:
+                self.assertEqual(result, "It's a tie")
+            else:
+                self.assertEqual(result, 'Winner is ' + COLORS[winner] + ' player: ' +
+                                 ('Leo' if winner == BLACK else 'Helen'))
+
+    def test_matches_bitboard_engine(self):
+        self.replay('bitboard')
+
+    def test_matches_list_engine(self):
+        self.replay('list')
+
+    def test_games_include_passes(self):
+        # make sure the comparison covers the pass rule
+        passes = sum(moves[ply][0] == moves[ply + 1][0] for moves in self.moves for ply in range(len(moves) - 1))
+        self.assertGreater(passes, 0)
+
+    def test_illegal_moves_and_finished_games(self):
+        games = BatchOthello(2)
+        with self.assertRaises(ValueError):
+            games.make_moves([0, bitboard.square_to_index(3, 4)])
+        games.play_random(np.random.default_rng(1))
+        black, white = games.return_boards()
+        games.make_moves([-1, 0])   # finished games ignore their moves
+        self.assertTrue(np.array_equal(games.return_boards()[0], black))
+        self.assertTrue(np.array_equal(games.return_legal_moves(), np.zeros(2, dtype=np.uint64)))
+
+
+if __name__ == '__main__':
+    unittest.main()
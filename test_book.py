@@ -0,0 +1,82 @@
+# Description: Tests for book.py: building an opening book from recorded games and looking
+#           positions up in it, in any of the board's 8 orientations.
+
+import os
+import tempfile
+import unittest
+
+import bitboard
+import book
+import records
+from Othello import Othello
+from test_records import play_random_game
+
+
+class TestOpeningBook(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.TemporaryDirectory()
+        cls.path = os.path.join(cls.directory.name, 'games.book')
+        cls.records = [records.record_from_game(play_random_game(seed)) for seed in range(30)]
+        cls.entries = book.build_book(cls.records, cls.path, plies=6)
+        cls.book = book.OpeningBook(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.book.close()
+        cls.directory.cleanup()
+
+    def positions(self):
+        """
+        Replays the first moves of every recorded game.
+        :return: generator of (black, white, color to move, move played) before each move
+        """
+        for record in self.records:
+            game = Othello('bitboard', verbose=False)
+            game.create_player('black', 'black')
+            game.create_player('white', 'white')
+            for color, position in list(record.iter_moves())[:6]:
+                if position is None:
+                    break
+                bitboards = game.return_bitboards()
+                yield bitboards['black'], bitboards['white'], color, position
+                game.make_move(color, position)
+
+    def test_played_moves_are_in_book(self):
+        self.assertEqual(len(self.book), self.entries)
+        for black, white, color, position in self.positions():
+            stats = self.book.return_move_stats(black, white, color)
+            index = bitboard.square_to_index(*position)
+            self.assertIn(index, stats)
+            games, wins, draws = stats[index]
+            self.assertGreaterEqual(games, 1)
+            self.assertLessEqual(wins + draws, games)
+
+    def test_opening_moves_share_statistics(self):
+        # the four first moves are mirror images of each other, so each has every game
+        black, white, color, _ = next(self.positions())
+        stats = self.book.return_move_stats(black, white, color)
+        self.assertEqual(len(stats), 4)
+        self.assertEqual({games for games, _, _ in stats.values()}, {len(self.records)})
+
+    def test_symmetric_lookups_agree(self):
+        for black, white, color, _ in self.positions():
+            stats = self.book.return_move_stats(black, white, color)
+            for symmetry in range(8):
+                moved = self.book.return_move_stats(book.transform(black, symmetry),
+                                                    book.transform(white, symmetry), color)
+                expected = {book.transform(1 << index, symmetry).bit_length() - 1: value
+                            for index, value in stats.items()}
+                self.assertEqual(moved, expected)
+
+    def test_book_moves_are_sorted_and_unknown_positions_are_empty(self):
+        black, white, color, _ = next(self.positions())
+        moves = self.book.return_book_moves(black, white, color)
+        self.assertTrue(moves)
+        rates = [rate for _, _, rate in moves]
+        self.assertEqual(rates, sorted(rates, reverse=True))
+        self.assertEqual(self.book.return_move_stats(1, 2, 'black'), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
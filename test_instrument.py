@@ -0,0 +1,42 @@
+# Description: Tests for instrument.py: counting after reset_stats(), and copies of an
+#           instrumented game counting their own calls.
+
+import copy
+import unittest
+
+from Othello import Othello
+
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.game = Othello('bitboard', verbose=False)
+        self.game.create_player('Leo', 'black')
+        self.game.create_player('Helen', 'white')
+        self.game.enable_instrumentation()
+        self.game.play_game('black', (3, 4))
+
+    def test_counts_after_reset(self):
+        self.game.reset_stats()
+        self.assertEqual(self.game.stats()['methods']['play_game']['calls'], 0)
+        self.game.play_game('white', (3, 3))
+        stats = self.game.stats()
+        self.assertEqual(stats['methods']['play_game']['calls'], 1)
+        self.assertGreater(stats['methods']['play_game']['total_ms'], 0.0)
+        self.assertEqual(stats['moves']['count'], 1)
+
+    def test_copies_count_their_own_calls(self):
+        copied = copy.deepcopy(self.game)
+        copied.play_game('white', (3, 3))
+        self.assertEqual(copied.stats()['methods']['play_game']['calls'], 2)
+        self.assertEqual(self.game.stats()['methods']['play_game']['calls'], 1)
+        self.assertNotEqual(copied.return_bitboards(), self.game.return_bitboards())
+        copied.disable_instrumentation()
+        copied.play_game('black', (2, 2))
+        self.assertEqual(copied.stats()['methods']['play_game']['calls'], 2)
+        # the original is still instrumented
+        self.game.play_game('white', (3, 3))
+        self.assertEqual(self.game.stats()['methods']['play_game']['calls'], 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+# Description: Tests for records.py: move encoding, and writing games to a record file and
+#           reading them back with read_games() and GameRecordFile.
+
+import os
+import random
+import tempfile
+import unittest
+
+import records
+from Othello import Othello
+from tournament import random_policy
+
+
+def play_random_game(seed):
+    """
+    Plays a random game through play_game(), so the game has a move history.
+    :param seed: random seed
+    :return: Othello object at the end of the game
+    """
+    rng = random.Random(seed)
+    game = Othello('bitboard', verbose=False)
+    game.create_player('black', 'black')
+    game.create_player('white', 'white')
+    color = 'black'
+    while True:
+        if game.return_available_positions(color):
+            if game.play_game(color, random_policy(game, color, rng)) is not None:
+                return game
+        color = 'white' if color == 'black' else 'black'
+
+
+class TestRecords(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games.rec')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_move_encoding_round_trip(self):
+        for color in ('black', 'white'):
+            self.assertEqual(records.decode_move(records.encode_move(color, None)), (color, None))
+            for row in range(1, 9):
+                for column in range(1, 9):
+                    self.assertEqual(records.decode_move(records.encode_move(color, (row, column))),
+                                     (color, (row, column)))
+
+    def test_games_round_trip(self):
+        games = [play_random_game(seed) for seed in range(20)]
+        with records.GameRecordWriter(self.path) as writer:
+            for game in games:
+                writer.write_game(game)
+
+        streamed = list(records.read_games(self.path, chunk_size=16))
+        with records.GameRecordFile(self.path) as record_file:
+            self.assertEqual(len(record_file), len(games))
+            for number, game in enumerate(games):
+                record = record_file[number]
+                self.assertEqual(record.moves, streamed[number].moves)
+                self.assertEqual(list(record.iter_moves()), game.return_history())
+                self.assertEqual((record.black_pieces, record.white_pieces),
+                                 (game.return_scores()['black'], game.return_scores()['white']))
+                self.assertNotEqual(record.result, records.UNFINISHED)
+                self.assertEqual(record_file.replay(number).return_bitboards(), game.return_bitboards())
+            self.assertEqual(record_file[-1].moves, streamed[-1].moves)
+            with self.assertRaises(IndexError):
+                record_file[len(games)]
+
+    def test_replayed_games_record_again(self):
+        games = [play_random_game(seed) for seed in range(20)]
+        self.assertTrue(any(position is None for game in games for _, position in game.return_history()))
+        for engine in ('list', 'bitboard'):
+            for game in games:
+                record = records.record_from_game(game)
+                replayed = record.replay(engine)
+                self.assertEqual(replayed.return_history(), game.return_history())
+                self.assertEqual(records.record_from_game(replayed).moves, record.moves)
+
+    def test_history_must_match_board(self):
+        game = Othello('bitboard', verbose=False)
+        game.create_player('black', 'black')
+        game.create_player('white', 'white')
+        self.assertEqual(records.record_from_game(game).moves, b'')
+        game.make_move('black', (3, 4))
+        with self.assertRaises(ValueError):
+            records.record_from_game(game)
+
+    def test_empty_and_bad_files(self):
+        with records.GameRecordWriter(self.path):
+            pass
+        self.assertEqual(list(records.read_games(self.path)), [])
+        with open(self.path, 'wb') as file:
+            file.write(b'not a record file at all')
+        with self.assertRaises(ValueError):
+            list(records.read_games(self.path))
+
+    def test_only_standard_board(self):
+        with self.assertRaises(ValueError):
+            records.record_from_game(Othello('bitboard', verbose=False, size=10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+# Description: Tests for server.py: the request protocol through GameServer.handle_request(),
+#           and the same requests over a TCP connection.
+
+import asyncio
+import json
+import time
+import unittest
+
+import server
+
+
+class TestProtocol(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.server = server.GameServer(idle_timeout=10.0, seed=0, clock=lambda: self.now)
+
+    def request(self, **request):
+        return self.server.handle_request(request)
+
+    def test_game_between_people(self):
+        response = self.request(op='new', black='Leo', white='Helen', request=7)
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['request'], 7)
+        self.assertEqual(response['players'], {'black': 'Leo', 'white': 'Helen'})
+        self.assertEqual(response['to_move'], 'black')
+        self.assertEqual(sorted(response['available']), [[3, 4], [4, 3], [5, 6], [6, 5]])
+        session = response['session']
+
+        response = self.request(op='move', session=session, color='black', position=[5, 6])
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['moves'], [{'color': 'black', 'position': [5, 6], 'taken': 1}])
+        self.assertEqual(response['scores'], {'black': 4, 'white': 1})
+        self.assertEqual(response['to_move'], 'white')
+
+        for color, position, error in (('black', [4, 6], "it is white's turn"),
+                                       ('white', [1, 1], 'not a valid move'),
+                                       ('white', [9, 1], 'not on the board'),
+                                       ('white', 'e6', 'position must be')):
+            response = self.request(op='move', session=session, color=color, position=position)
+            self.assertFalse(response['ok'])
+            self.assertIn(error, response['error'])
+
+        self.assertEqual(self.request(op='state', session=session)['board'][4], '...XXX..')
+        self.assertTrue(self.request(op='close', session=session)['closed'])
+        self.assertFalse(self.request(op='state', session=session)['ok'])
+
+    def test_bot_games_finish(self):
+        response = self.request(op='new', bots={'black': 'random', 'white': 'greedy'})
+        self.assertTrue(response['finished'])
+        self.assertIsNone(response['to_move'])
+        self.assertEqual(response['result']['black'] + response['result']['white'],
+                         sum(line.count('X') + line.count('O') for line in response['board']))
+
+        response = self.request(op='new', bots={'white': 'search'})
+        response = self.request(op='move', session=response['session'], color='black', position=[5, 6])
+        self.assertEqual([move['color'] for move in response['moves']], ['black', 'white'])
+
+    def test_search_bots_are_limited(self):
+        start = time.perf_counter()
+        response = self.request(op='new', bots={'black': f'search:{server.MAX_SEARCH_DEPTH}',
+                                                'white': f'search:{server.MAX_SEARCH_DEPTH}'})
+        self.assertTrue(response['finished'])
+        self.assertLess(time.perf_counter() - start, 2.0)
+        response = self.request(op='new', bots={'black': f'search:{server.MAX_SEARCH_DEPTH + 1}'})
+        self.assertFalse(response['ok'])
+
+    def test_bad_requests(self):
+        for request in ({'op': 'new', 'bots': ['white']}, {'op': 'new', 'bots': 'x'},
+                        {'op': 'new', 'bots': {'white': 5}}, {'op': 'new', 'bots': {'red': 'random'}},
+                        {'op': 'new', 'bots': {'white': 'search:0'}}, {'op': 'fly'}, {'op': 'state'},
+                        {'op': 'move', 'session': 'one'}):
+            response = self.server.handle_request(request)
+            self.assertFalse(response['ok'], request)
+            self.assertIsInstance(response['error'], str)
+        self.assertFalse(self.server.handle_request(['op', 'new'])['ok'])
+
+    def test_idle_sessions_are_evicted(self):
+        first = self.request(op='new')['session']
+        self.now = 5.0
+        second = self.request(op='new')['session']
+        self.now = 12.0
+        self.assertEqual(self.server.evict_idle(), 1)
+        self.assertFalse(self.request(op='state', session=first)['ok'])
+        self.assertTrue(self.request(op='state', session=second)['ok'])
+        stats = self.request(op='stats')
+        self.assertEqual((stats['sessions'], stats['created'], stats['evicted']), (1, 2, 1))
+        self.assertGreater(stats['bytes_per_session'], 0)
+
+
+class TestConnection(unittest.TestCase):
+    def test_requests_over_tcp(self):
+        async def talk():
+            game_server = server.GameServer(seed=0)
+            listener = await asyncio.start_server(game_server.handle_connection, '127.0.0.1', 0)
+            port = listener.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            responses = []
+            for line in (b'{"op": "new", "bots": ["white"]}', b'not json', b'',
+                         b'{"op": "new", "bots": {"white": "greedy"}}'):
+                writer.write(line + b'\n')
+                if line:
+                    responses.append(json.loads(await reader.readline()))
+            writer.close()
+            listener.close()
+            await listener.wait_closed()
+            return responses
+
+        responses = asyncio.run(talk())
+        self.assertEqual([response['ok'] for response in responses], [False, False, True])
+        self.assertEqual(responses[1]['error'], 'request is not valid JSON')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,276 @@
+# Description: Self-play and tournament runner. Plays a number of games between two move
+#           policies across a pool of worker processes. Games are handed out in chunks, each
+#           game is seeded from the tournament seed and its game number so results are
+#           reproducible, and results are streamed back and added up as chunks finish. Games are
+#           played through Othello.play_game() with printing turned off.
+#           Run from the command line, e.g.: python tournament.py random greedy --games 1000
+
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+
+from Othello import Othello
+
+
+def valid_positions(game, color):
+    """
+    Returns the valid moves for a color without duplicates and in row-major order. The list
+    engine's available positions can hold the same position more than once, in an order that
+    depends on how the pieces were placed, so policies choose from this list instead to give
+    every move the same chance and the same results on both engines.
+    :param game: Othello object
+    :param color: color to move
+    :return: list of (row, column) positions
+    """
+    return sorted(set(game.return_available_positions(color)))
+
+
+def random_policy(game, color, rng):
+    """
+    Picks one of the valid moves at random.
+    :param game: Othello object
+    :param color: color to move
+    :param rng: random.Random seeded for this game
+    :return: (row, column) position
+    """
+    return rng.choice(valid_positions(game, color))
+
+
+def greedy_policy(game, color, rng):
+    """
+    Picks the valid move that takes the most pieces, breaking ties at random.
+    :param game: Othello object
+    :param color: color to move
+    :param rng: random.Random seeded for this game
+    :return: (row, column) position
+    """
+    best_positions = []
+    best_taken = -1
+    for position in valid_positions(game, color):
+        delta = game.apply_move(color, position)
+        taken = delta.flipped.bit_count()
+        game.unmake_move(delta)
+        if taken > best_taken:
+            best_positions = [position]
+            best_taken = taken
+        elif taken == best_taken:
+            best_positions.append(position)
+    return rng.choice(best_positions)
+
+
+def make_search_policy(depth):
+    """
+    Makes a policy that plays Othello.best_move() searched to a fixed depth. A fixed depth
+    (rather than a time budget) keeps games reproducible.
+    :param depth: search depth
+    :return: policy function
+    """
+    def search_policy(game, color, rng):
+        return game.best_move(color, depth=depth, time_budget_ms=None)
+    return search_policy
+
+
+def get_policy(name):
+    """
+    Turns a policy name into a policy function. Names are 'random', 'greedy', and 'search' or
+    'search:<depth>' (depth 2 by default).
+    :param name: policy name
+    :return: policy function taking (game, color, rng) and returning a (row, column) position
+    """
+    if name == 'random':
+        return random_policy
+    if name == 'greedy':
+        return greedy_policy
+    if name == 'search' or name.startswith('search:'):
+        depth = name.partition(':')[2] or '2'
+        if depth.isdigit() and int(depth) > 0:
+            return make_search_policy(int(depth))
+    raise ValueError(f"unknown policy {name!r}; use 'random', 'greedy' or 'search[:depth]'")
+
+
+def play_one_game(black_policy, white_policy, rng, engine='bitboard', size=8):
+    """
+    Plays a full game between two policies. Turns alternate, and a color with no valid move
+    passes.
+    :param black_policy: policy function for black
+    :param white_policy: policy function for white
+    :param rng: random.Random passed to the policies
+    :param engine: Othello engine to use
+    :param size: board size ('search' policies need the 8x8 board)
+    :return: (black pieces, white pieces) at the end of the game
+    """
+    game = Othello(engine, verbose=False, size=size)
+    game.create_player('black', 'black')
+    game.create_player('white', 'white')
+    policies = {'black': black_policy, 'white': white_policy}
+    color = 'black'
+    while True:
+        opponent = 'white' if color == 'black' else 'black'
+        if game.return_available_positions(color):
+            if game.play_game(color, policies[color](game, color, rng)) is not None:
+                break   # play_game returns the winner once neither color can move
+        color = opponent
+    scores = game.return_scores()
+    return scores['black'], scores['white']
+
+
+def play_chunk(first_policy, second_policy, seed, start, stop, engine='bitboard', size=8):
+    """
+    Plays games start through stop - 1 of a tournament. Even-numbered games give the first
+    policy black and odd-numbered games give it white. Each game's random numbers come from
+    the tournament seed and its game number only, so a game plays the same wherever it runs.
+    :return: list of (game number, first policy's pieces, second policy's pieces)
+    """
+    first = get_policy(first_policy)
+    second = get_policy(second_policy)
+    results = []
+    for number in range(start, stop):
+        rng = random.Random(f'{seed}:{number}')
+        if number % 2 == 0:
+            first_pieces, second_pieces = play_one_game(first, second, rng, engine, size)
+        else:
+            second_pieces, first_pieces = play_one_game(second, first, rng, engine, size)
+        results.append((number, first_pieces, second_pieces))
+    return results
+
+
+class TournamentSummary:
+    """
+    This class adds up tournament results as they arrive: wins for each policy, ties, and the
+    total disc differential (first policy's pieces minus the second's).
+    """
+    def __init__(self, first_policy, second_policy):
+        self._first_policy = first_policy
+        self._second_policy = second_policy
+        self._games = 0
+        self._first_wins = 0
+        self._second_wins = 0
+        self._ties = 0
+        self._differential = 0
+
+    def add(self, first_pieces, second_pieces):
+        """
+        Adds the result of one game.
+        :param first_pieces: first policy's pieces at the end of the game
+        :param second_pieces: second policy's pieces at the end of the game
+        :return: None
+        """
+        self._games += 1
+        self._differential += first_pieces - second_pieces
+        if first_pieces > second_pieces:
+            self._first_wins += 1
+        elif second_pieces > first_pieces:
+            self._second_wins += 1
+        else:
+            self._ties += 1
+
+    def to_dict(self):
+        """
+        Returns the totals so far.
+        :return: dict of games, wins per policy, ties, total and mean disc differential
+        """
+        return {
+            'first_policy': self._first_policy,
+            'second_policy': self._second_policy,
+            'games': self._games,
+            'first_wins': self._first_wins,
+            'second_wins': self._second_wins,
+            'ties': self._ties,
+            'disc_differential': self._differential,
+            'mean_disc_differential': self._differential / self._games if self._games else 0.0
+        }
+
+
+def check_tournament(first_policy, second_policy, size=8):
+    """
+    Checks a tournament's settings before any games are played.
+    :param first_policy: name of the first policy (see get_policy())
+    :param second_policy: name of the second policy
+    :param size: board size
+    :return: None
+    :raises ValueError: for an unknown policy, a board size Othello doesn't allow, or a search
+                        policy on a board other than 8x8
+    """
+    get_policy(first_policy)
+    get_policy(second_policy)
+    if size < 4 or size % 2:
+        raise ValueError(f'size must be an even number of at least 4, not {size!r}')
+    if size != 8 and any(name.startswith('search') for name in (first_policy, second_policy)):
+        raise ValueError('search policies only support the 8x8 board')
+
+
+def iter_tournament(first_policy, second_policy, games, workers=None, chunk_size=50, seed=0,
+                    engine='bitboard', size=8):
+    """
+    Plays a tournament and yields each chunk's results as soon as it finishes (chunks finish
+    in any order). With one worker the games are played in this process.
+    :param first_policy: name of the first policy (see get_policy())
+    :param second_policy: name of the second policy
+    :param games: number of games to play
+    :param workers: number of worker processes; None uses every CPU
+    :param chunk_size: number of games handed to a worker at a time
+    :param seed: tournament seed
+    :param engine: Othello engine to use
+    :param size: board size
+    :return: generator of lists of (game number, first policy's pieces, second policy's pieces)
+    """
+    check_tournament(first_policy, second_policy, size)    # fail here rather than inside the workers
+    chunks = [(start, min(start + chunk_size, games)) for start in range(0, games, chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for start, stop in chunks:
+            yield play_chunk(first_policy, second_policy, seed, start, stop, engine, size)
+        return
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_chunk, first_policy, second_policy, seed, start, stop, engine, size)
+                   for start, stop in chunks]
+        for future in concurrent.futures.as_completed(futures):
+            yield future.result()
+
+
+def run_tournament(first_policy, second_policy, games, workers=None, chunk_size=50, seed=0,
+                   engine='bitboard', progress=None, size=8):
+    """
+    Plays a tournament and returns the totals.
+    :param progress: optional function called with the running totals (a dict, see
+                     TournamentSummary.to_dict()) after every chunk
+    :return: dict of totals (see TournamentSummary.to_dict())
+    The other parameters are the same as for iter_tournament().
+    """
+    summary = TournamentSummary(first_policy, second_policy)
+    for results in iter_tournament(first_policy, second_policy, games, workers, chunk_size, seed, engine, size):
+        for _, first_pieces, second_pieces in results:
+            summary.add(first_pieces, second_pieces)
+        if progress is not None:
+            progress(summary.to_dict())
+    return summary.to_dict()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Play Othello games between two move policies.')
+    parser.add_argument('first_policy', help="'random', 'greedy' or 'search[:depth]'")
+    parser.add_argument('second_policy', help="'random', 'greedy' or 'search[:depth]'")
+    parser.add_argument('--games', type=int, default=100, help='number of games (default 100)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: all CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=50, help='games per chunk (default 50)')
+    parser.add_argument('--seed', type=int, default=0, help='tournament seed (default 0)')
+    parser.add_argument('--engine', choices=('list', 'bitboard'), default='bitboard')
+    parser.add_argument('--size', type=int, default=8, help='board size, an even number (default 8)')
+    parser.add_argument('--progress', action='store_true', help='print running totals after every chunk')
+    args = parser.parse_args(argv)
+    try:
+        check_tournament(args.first_policy, args.second_policy, args.size)
+    except ValueError as error:
+        parser.error(str(error))
+
+    progress = (lambda totals: print(json.dumps(totals), flush=True)) if args.progress else None
+    totals = run_tournament(args.first_policy, args.second_policy, args.games, args.workers,
+                            args.chunk_size, args.seed, args.engine, progress, args.size)
+    print(json.dumps(totals))
+
+
+if __name__ == '__main__':
+    main()